@@ -0,0 +1,98 @@
+"""
+Compare the bucket and sweep line-merging engines on dense pages.
+
+    python src/benchmark_line_merge.py [file.pdf ...]
+
+Without arguments it runs on synthetic dense pages and on every PDF of the
+sample dataset. For each page set it reports the time per engine and how
+much of the merged output the two engines agree on.
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from heading_merger import merge_candidate_headings
+from compute_dominant_gaps import compute_dynamic_thresholds_from_raw_lines
+
+SAMPLE_PDF_DIR = os.path.join(os.path.dirname(__file__), "..", "sample_dataset", "pdfs")
+REPEATS = 5
+
+
+def synthetic_page(rows=120, columns=3, fragments_per_row=4, seed=0):
+    """A dense multi-column page whose rows are split into jittered fragments."""
+    rng = random.Random(seed)
+    lines = []
+    for col in range(columns):
+        x0 = 40 + col * 180
+        for row in range(rows):
+            y = 40 + row * 6.5 + rng.uniform(-0.4, 0.4)
+            font_size = 14 if row % 25 == 0 else 6
+            x = x0
+            for frag in range(fragments_per_row):
+                text = f"w{col}{row}{frag} " + "x" * rng.randint(2, 8)
+                lines.append({"text": text, "x": x, "y": y, "font_size": font_size, "page": 1})
+                x += 8 * len(text) / 2
+    rng.shuffle(lines)
+    return lines
+
+
+def pdf_pages(pdf_path):
+    from heading_extractor import preprocess_pdf
+
+    return [lines for (_, lines, _, _) in preprocess_pdf(pdf_path)]
+
+
+def run_engine(pages, engine, max_y_gap, max_x_gap):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        output = [
+            merge_candidate_headings([dict(l) for l in page], max_y_gap, max_x_gap, engine=engine)
+            for page in pages
+        ]
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def agreement(a, b):
+    """Share of merged texts (as a multiset) produced by both engines."""
+    ta = Counter(item["text"] for page in a for item in page)
+    tb = Counter(item["text"] for page in b for item in page)
+    total = max(sum(ta.values()), sum(tb.values()), 1)
+    return sum((ta & tb).values()) / total
+
+
+def benchmark(name, pages):
+    thresholds = compute_dynamic_thresholds_from_raw_lines(pages)
+    max_y_gap, max_x_gap = thresholds["dyn_y_gap"], thresholds["dyn_x_gap"]
+    line_count = sum(len(page) for page in pages)
+
+    bucket_time, bucket_out = run_engine(pages, "bucket", max_y_gap, max_x_gap)
+    sweep_time, sweep_out = run_engine(pages, "sweep", max_y_gap, max_x_gap)
+
+    print(
+        f"{name:<32} lines={line_count:<6} "
+        f"bucket={bucket_time * 1000:8.2f}ms ({sum(map(len, bucket_out))} merged)  "
+        f"sweep={sweep_time * 1000:8.2f}ms ({sum(map(len, sweep_out))} merged)  "
+        f"speedup={bucket_time / sweep_time:5.2f}x  agreement={agreement(bucket_out, sweep_out):.0%}"
+    )
+
+
+def main(pdf_paths):
+    if not pdf_paths:
+        benchmark("synthetic (1 dense page)", [synthetic_page()])
+        benchmark("synthetic (20 dense pages)", [synthetic_page(seed=s) for s in range(20)])
+        if os.path.isdir(SAMPLE_PDF_DIR):
+            pdf_paths = sorted(
+                os.path.join(SAMPLE_PDF_DIR, f)
+                for f in os.listdir(SAMPLE_PDF_DIR) if f.lower().endswith(".pdf")
+            )
+
+    for pdf_path in pdf_paths:
+        benchmark(os.path.basename(pdf_path), pdf_pages(pdf_path))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
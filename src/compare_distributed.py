@@ -0,0 +1,84 @@
+"""
+Check that a distributed run produces the same outlines as a single node.
+
+    python src/compare_distributed.py [--nodes 3] [--pages-per-job 3] [pdf_dir]
+
+Runs every PDF of `pdf_dir` (default: the sample dataset) once in-process,
+then through `main.py --distributed` with several node processes sharing a
+fresh job store, and compares the two outlines of each document. Exits
+with status 1 if any of them differ. The time budget is turned off, so
+neither run degrades.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_PDF_DIR = os.path.join(SRC_DIR, "..", "sample_dataset", "pdfs")
+
+
+def single_node_outlines(pdf_dir):
+    from heading_extractor import extract_headings_hybrid, shutdown_worker_pool
+
+    outlines = {}
+    for name in sorted(os.listdir(pdf_dir)):
+        if name.lower().endswith(".pdf"):
+            outlines[name] = extract_headings_hybrid(os.path.join(pdf_dir, name))
+    shutdown_worker_pool()
+    return outlines
+
+
+def distributed_outlines(pdf_dir, nodes, pages_per_job):
+    with tempfile.TemporaryDirectory() as work:
+        out = os.path.join(work, "out")
+        command = [
+            sys.executable, os.path.join(SRC_DIR, "main.py"), pdf_dir, "-o", out,
+            "--distributed", os.path.join(work, "jobs.db"), "--pages-per-job", str(pages_per_job),
+        ]
+        env = {**os.environ, "DOCUMENT_TIME_BUDGET": "0"}
+        procs = [
+            subprocess.Popen(command + ["--node-id", f"node-{n}"], env=env, stdout=subprocess.DEVNULL)
+            for n in range(nodes)
+        ]
+        if any(proc.wait() for proc in procs):
+            sys.exit("a node exited with an error")
+
+        outlines = {}
+        for name in os.listdir(out):
+            if name.endswith(".json"):
+                with open(os.path.join(out, name), encoding="utf-8") as f:
+                    outlines[name[:-len(".json")] + ".pdf"] = json.load(f)
+        return outlines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare distributed and single-node outlines.")
+    parser.add_argument("pdf_dir", nargs="?", default=SAMPLE_PDF_DIR)
+    parser.add_argument("--nodes", type=int, default=3, help="node processes (default: 3)")
+    parser.add_argument("--pages-per-job", type=int, default=3,
+                        help="page range size, small to split every document (default: 3)")
+    args = parser.parse_args(argv)
+
+    expected = single_node_outlines(args.pdf_dir)
+    actual = distributed_outlines(args.pdf_dir, args.nodes, args.pages_per_job)
+
+    differing = 0
+    for name, result in expected.items():
+        other = actual.get(name)
+        if other == result:
+            print(f"  same     {name} ({len(result['outline'])} headings)")
+            continue
+        differing += 1
+        found = "missing" if other is None else f"{len(other['outline'])} headings"
+        print(f"  DIFFERS  {name}: {len(result['outline'])} headings on one node, {found} distributed")
+
+    print(f"\n{len(expected) - differing}/{len(expected)} documents identical "
+          f"({args.nodes} nodes, {args.pages_per_job} pages per job)")
+    return 1 if differing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,55 @@
-from statistics import mode
+from collections import Counter
 
-def compute_dynamic_thresholds_from_raw_lines(all_raw_lines_per_page):
-    y_diffs = []
-    x_diffs = []
-    font_sizes = []
 
-    for lines in all_raw_lines_per_page:
-        sorted_lines = sorted(lines, key=lambda l: (l["y"], l["x"]))
-        for i in range(1, len(sorted_lines)):
-            dy = abs(sorted_lines[i]["y"] - sorted_lines[i - 1]["y"])
-            dx = abs(sorted_lines[i]["x"] - sorted_lines[i - 1]["x"])
+def page_gap_histogram(lines):
+    """
+    Summarize one page's lines as rounded gap and font-size histograms.
+
+    Histograms of several pages can be merged, so pages that were extracted
+    in different processes only need to ship these counts, not their lines.
+    """
+    y_diffs = Counter()
+    x_diffs = Counter()
+
+    sorted_lines = sorted(lines, key=lambda l: (l["y"], l["x"]))
+    for i in range(1, len(sorted_lines)):
+        dy = abs(sorted_lines[i]["y"] - sorted_lines[i - 1]["y"])
+        dx = abs(sorted_lines[i]["x"] - sorted_lines[i - 1]["x"])
+
+        if dy > 0:
+            y_diffs[round(dy, 2)] += 1
+        if dx > 0:
+            x_diffs[round(dx, 2)] += 1
+
+    font_sizes = Counter(round(line["font_size"], 2) for line in lines if "font_size" in line)
+
+    return {"y": y_diffs, "x": x_diffs, "font": font_sizes}
 
-            if dy > 0:
-                y_diffs.append(round(dy, 2))
-            if dx > 0:
-                x_diffs.append(round(dx, 2))
 
-        font_sizes.extend(round(line["font_size"], 2) for line in lines if "font_size" in line)
+def _mode(counter, default):
+    # Ties go to the value seen first, like statistics.mode on the flat list
+    return counter.most_common(1)[0][0] if counter else default
+
+
+def compute_dynamic_thresholds_from_histograms(histograms):
+    """Merge per-page histograms (in page order) into the global thresholds."""
+    y_diffs = Counter()
+    x_diffs = Counter()
+    font_sizes = Counter()
+
+    for histogram in histograms:
+        y_diffs.update(histogram["y"])
+        x_diffs.update(histogram["x"])
+        font_sizes.update(histogram["font"])
 
     return {
-        "dyn_y_gap": mode(y_diffs) if y_diffs else 5,
-        "dyn_x_gap": mode(x_diffs) if x_diffs else 5,
-        "common_font": mode(font_sizes) if font_sizes else 12
+        "dyn_y_gap": _mode(y_diffs, 5),
+        "dyn_x_gap": _mode(x_diffs, 5),
+        "common_font": _mode(font_sizes, 12)
     }
+
+
+def compute_dynamic_thresholds_from_raw_lines(all_raw_lines_per_page):
+    return compute_dynamic_thresholds_from_histograms(
+        page_gap_histogram(lines) for lines in all_raw_lines_per_page
+    )
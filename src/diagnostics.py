@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import signal
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Seconds of CPU time between two stack samples
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler:
+    """
+    Cheap statistical profiler: a SIGPROF timer records the Python stack of
+    the main thread every `interval` seconds of CPU time. Time spent inside
+    MuPDF/tesseract is attributed to the Python line that called into it.
+    The counts use the "folded stacks" format understood by flamegraph.pl
+    and speedscope.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, root=None):
+        self.interval = interval
+        # Name of the function the stacks start at; frames above it (e.g.
+        # the parent's, inherited by a forked worker) are left out
+        self.root = root
+        self.stacks = Counter()
+        self._previous_handler = None
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            if code.co_name == self.root:
+                break
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        return self.stacks
+
+
+class NullTrace:
+    """Stand-in used when diagnostics are off; every hook is a no-op."""
+
+    sample_interval = None
+
+    @contextmanager
+    def stage(self, name, page=None):
+        yield
+
+    def page(self, index):
+        return {}
+
+    def set_total_pages(self, count):
+        pass
+
+    def on_task(self, func, item, seconds, stacks):
+        pass
+
+    @contextmanager
+    def sampling(self):
+        yield self
+
+
+NULL_TRACE = NullTrace()
+
+
+class DocumentTrace(NullTrace):
+    """
+    Per-document record of stage timings, per-page intermediate data (line
+    counts, table boxes, OCR flags) and sampled stacks of the parent and the
+    page workers, written out only for documents that turn out slow.
+    """
+
+    def __init__(self, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.stages = Counter()
+        self.pages = defaultdict(dict)
+        self.worker_stacks = Counter()
+        self.parent_stacks = Counter()
+        self.total_pages = 0
+
+    @contextmanager
+    def stage(self, name, page=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stages[name] += seconds
+            if page is not None:
+                self.pages[page][f"{name}_s"] = round(seconds, 4)
+
+    def page(self, index):
+        return self.pages[index]
+
+    def set_total_pages(self, count):
+        self.total_pages = count
+
+    def on_task(self, func, item, seconds, stacks):
+        """Called by the page pool for every finished task."""
+        name = getattr(func, "__name__", str(func))
+        self.stages[f"worker:{name}"] += seconds
+        if name == "extract_page_statistics":
+            page_index = item[1][0]
+            self.pages[page_index]["worker_extract_s"] = round(seconds, 4)
+        elif name == "find_page_tables":
+            self.pages[item[2]]["find_tables_s"] = round(seconds, 4)
+        if stacks:
+            self.worker_stacks.update(stacks)
+
+    @contextmanager
+    def sampling(self):
+        """Sample the parent's stacks for the duration of the block."""
+        sampler = StackSampler(self.sample_interval)
+        sampler.start()
+        try:
+            yield self
+        finally:
+            self.parent_stacks.update(sampler.stop())
+
+    def dump(self, directory, name, elapsed, result=None):
+        """Write the trace of a slow document under directory/<name>/."""
+        target = os.path.join(directory, os.path.splitext(name)[0])
+        os.makedirs(target, exist_ok=True)
+
+        summary = {
+            "source": name,
+            "elapsed_s": round(elapsed, 3),
+            "pages": self.total_pages,
+            "seconds_per_page": round(elapsed / max(self.total_pages, 1), 3),
+            "stages_s": {k: round(v, 4) for k, v in self.stages.most_common()},
+            "degradations": (result or {}).get("degradations", []),
+            "pages_detail": {str(k + 1): v for k, v in sorted(self.pages.items())},
+        }
+        with open(os.path.join(target, "trace.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        for filename, stacks in (("parent.folded", self.parent_stacks), ("workers.folded", self.worker_stacks)):
+            with open(os.path.join(target, filename), "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return target
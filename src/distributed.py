@@ -0,0 +1,140 @@
+import time
+import threading
+
+from input_sources import iter_directory, source_fingerprint, DEFAULT_INCLUDE
+from output_sinks import manifest_record
+
+
+class _Heartbeat:
+    """Renew a lease in the background while the claimed work runs."""
+
+    def __init__(self, queue, kind, key):
+        self.queue = queue
+        self.kind = kind
+        self.key = key
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.renew(self.kind, self.key)
+            except Exception as e:
+                print(f"[!] Could not renew lease: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def enqueue_directory(queue, input_dir, pages_per_job, recursive=False,
+                      include=DEFAULT_INCLUDE, exclude=()):
+    """Queue every PDF of `input_dir` that the job store does not know yet."""
+    import fitz  # PyMuPDF
+
+    added = 0
+    for source in iter_directory(input_dir, recursive, include, exclude):
+        fingerprint = source_fingerprint(source)
+        if queue.is_known(source.name, fingerprint):
+            continue
+        try:
+            with fitz.open(source.path) as doc:
+                total_pages = doc.page_count
+        except Exception as e:
+            print(f"[!] Cannot open {source.name}, not queued: {e}")
+            continue
+        if queue.enqueue_document(source.name, fingerprint, source.path, total_pages, pages_per_job):
+            added += 1
+    return added
+
+
+def _extract_range(queue, job, time_budget):
+    from heading_extractor import extract_page_lines
+
+    label = f"{job['source']} pages {job['first_page'] + 1}-{job['end_page']}"
+    print(f"\n[+] Processing: {label}")
+    start = time.perf_counter()
+    try:
+        pages = extract_page_lines(
+            job["path"],
+            time_budget=time_budget,
+            page_range=(job["first_page"], job["end_page"]),
+        )
+    except Exception as e:
+        queue.fail(job["id"], str(e))
+        print(f"[!] Failed to process {label}: {e}")
+        return
+
+    elapsed = time.perf_counter() - start
+    if queue.complete(job["id"], pages, elapsed):
+        print(f"[✓] Extracted {label}  ⏱ {elapsed:.2f} seconds")
+    else:
+        print(f"[!] Lease on {label} expired; another node is redoing it")
+
+
+def assemble_document(queue, doc, sink):
+    """
+    Merge the page-range results of a document into one outline and write
+    it. Ranges store their extracted lines; running headers/footers and gap
+    thresholds are settled here over the whole document, so the outline is
+    the one a single node would produce.
+    """
+    from heading_extractor import merge_page_lines, build_outline
+
+    pages = []
+    degradations = []
+    seconds = 0.0
+    for job in queue.range_results(doc["source"], doc["fingerprint"]):
+        seconds += job["seconds"] or 0.0
+        if job["status"] != "done":
+            degradations.append(f"missing_pages:{job['first_page'] + 1}-{job['end_page']}")
+            continue
+        pages.extend(job["result"]["pages"])
+        degradations.extend(d for d in job["result"]["degradations"] if d not in degradations)
+
+    start = time.perf_counter()
+    candidates = merge_page_lines(pages)
+    seconds += time.perf_counter() - start
+    degradations.extend(candidates["degradations"])
+
+    result = build_outline(candidates["headings"], doc["total_pages"], degradations)
+    sink.write(
+        doc["source"], result,
+        manifest_record(doc["source"], doc["fingerprint"], "ok", seconds, result=result),
+    )
+    sink.flush()
+    queue.mark_assembled(doc["source"], doc["fingerprint"])
+    print(f"[✓] Saved to: {sink.location(doc['source'])}  ⏱ {seconds:.2f} seconds of extraction")
+
+
+def run_node(queue, input_dir, sink, pages_per_job=50, recursive=False,
+             include=DEFAULT_INCLUDE, exclude=(), time_budget=None, poll_interval=2.0):
+    """
+    Work as one node of a distributed run until every queued document is
+    assembled. Nodes need no coordinator: each one enqueues what it finds,
+    then claims page ranges and assemblies from the shared job store. A
+    node waits instead of exiting while others still hold leases, so it can
+    take over their work if they crash.
+    """
+    added = enqueue_directory(queue, input_dir, pages_per_job, recursive, include, exclude)
+    print(f"Node {queue.node_id}: queued {added} new document(s) from {input_dir}")
+
+    while True:
+        claim = queue.claim()
+        if claim is None:
+            if not queue.unfinished():
+                break
+            time.sleep(poll_interval)
+            continue
+
+        kind, item = claim
+        if kind == "extract":
+            with _Heartbeat(queue, kind, item["id"]):
+                _extract_range(queue, item, time_budget)
+        else:
+            with _Heartbeat(queue, kind, (item["source"], item["fingerprint"])):
+                assemble_document(queue, item, sink)
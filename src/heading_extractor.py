@@ -2,6 +2,41 @@ import re
 from collections import Counter, defaultdict
 from typing import List, Dict, Callable
 
+# Page worker pool settings, shared by every document processed in this process
+WORKER_POOL_SIZE = 8
+PAGE_TASK_TIMEOUT = 60          # seconds before a page task's worker is killed
+WORKER_MAX_TASKS = 500          # recycle a worker after this many page tasks
+WORKER_MAX_RSS_MB = 1536        # ... or once its resident memory exceeds this
+
+_worker_pool = None
+
+
+def get_worker_pool():
+    """Return the process-wide page worker pool, starting it on first use."""
+    global _worker_pool
+    if _worker_pool is None or not _worker_pool.owned_by_current_process():
+        from supervised_pool import SupervisedPool
+
+        _worker_pool = SupervisedPool(
+            processes=WORKER_POOL_SIZE,
+            task_timeout=PAGE_TASK_TIMEOUT,
+            max_tasks_per_worker=WORKER_MAX_TASKS,
+            max_rss_mb=WORKER_MAX_RSS_MB,
+            retries=1,
+        )
+    return _worker_pool
+
+
+def shutdown_worker_pool():
+    """Stop the page worker pool and return its event counters."""
+    global _worker_pool
+    if _worker_pool is None:
+        return Counter()
+    stats = _worker_pool.stats
+    _worker_pool.close()
+    _worker_pool = None
+    return stats
+
 
 def merge_adjacent_headings_by_level(ranked: List[Dict], max_y_gap: float = 5.0) -> List[Dict]:
     """
@@ -126,9 +161,35 @@ def normalize_heading_levels(outline: List[Dict]) -> List[Dict]:
     return outline
 
 
-def preprocess_pdf(pdf_path):
+def preprocess_pdf(pdf_path, budget=None, drop_running=True, stream=None, page_range=None,
+                   trace=None, margins=None):
+    """
+    Extract each page's text lines (outside tables) and, for pages whose
+    text layer looks broken, a rendered image for OCR.
+
+    stream: the PDF's bytes, read instead of `pdf_path` when given.
+    page_range: (first, end) zero-based page indices to process, end
+    exclusive; the whole document by default.
+    trace: optional diagnostics.DocumentTrace receiving per-page timings
+    and intermediate data.
+
+    drop_running: remove running headers/footers (lines repeated in the same
+    margin band across pages) before anything else sees them.
+    margins: optional list receiving (page height, margin fingerprint) for
+    each page, for callers that settle running elements over more pages
+    than these (with drop_running=False).
+    """
+    import uuid
     import fitz  # PyMuPDF
     from ocr_utils import render_page_to_image, is_broken_text
+    from time_budget import DocumentBudget
+    from running_elements import page_fingerprint, merge_fingerprints, running_keys, drop_running_lines
+    from diagnostics import NULL_TRACE
+
+    if budget is None:
+        budget = DocumentBudget()
+    if trace is None:
+        trace = NULL_TRACE
 
     # Helper: is the inner bbox fully inside outer bbox (with tolerance)?
     def bbox_inside(inner, outer, tol=2):
@@ -139,31 +200,31 @@ def preprocess_pdf(pdf_path):
             ix1 - tol <= ox1  and iy1 - tol <= oy1
         )
 
-    doc = fitz.open(pdf_path)
+    if stream is not None:
+        doc = fitz.open(stream=stream, filetype="pdf")
+    else:
+        doc = fitz.open(pdf_path)
     pre_data = []
-
-    for i, page in enumerate(doc):
-        # --- Find tables and optionally filter boxes ---
-        try:
-            tables = page.find_tables()
-            table_bboxes = [table.bbox for table in tables.tables]
-        except Exception:
-            table_bboxes = []
-        # Table box post-filtering: exclude very odd/small/huge bboxes
-        page_width, page_height = page.rect.width, page.rect.height
-        filtered_table_bboxes = []
-        for tb in table_bboxes:
-            x0, y0, x1, y1 = tb
-            width = x1 - x0
-            height = y1 - y0
-            # Filter: minimum height, max width percent (adjust as needed)
-            if height > 40 and width/page_width < 0.98:
-                filtered_table_bboxes.append(tb)
-        table_bboxes = filtered_table_bboxes
-
-        # --- Extract lines, skip those fully inside table boxes ---
-        lines = []
-        blocks = page.get_text("dict")["blocks"]
+    page_heights = []
+    fingerprints = []
+
+    first_page, end_page = page_range or (0, doc.page_count)
+    pages = range(first_page, min(end_page, doc.page_count))
+
+    # --- Extract every page's text first: it is cheap and the outline
+    # cannot do without it, so table detection and OCR only get the time
+    # left after it. Lines are kept with their bbox until tables are known.
+    extracted = []  # (page index, [(line, bbox, avg font size)], page rect)
+    for i in pages:
+        # --- Out of time: keep the pages done so far ---
+        if budget.exhausted():
+            budget.degrade("truncated_to_pages", f"{i}/{doc.page_count}")
+            break
+
+        page = doc[i]
+        page_lines = []
+        with trace.stage("get_text", i):
+            blocks = page.get_text("dict")["blocks"]
         for block in blocks:
             for line in block.get("lines", []):
                 spans = line.get("spans", [])
@@ -199,33 +260,86 @@ def preprocess_pdf(pdf_path):
                     y0 = min(s["bbox"][1] for s in vspans)
                     x1 = max(s["bbox"][2] for s in vspans)
                     y1 = max(s["bbox"][3] for s in vspans)
-                    line_bbox = (x0, y0, x1, y1)
-
-                    # --- Skip if inside any table bbox (unless it's a heading-like label) ---
-                    in_table = False
-                    for tbbox in table_bboxes:
-                        if bbox_inside(line_bbox, tbbox, tol=2):
-                            avg_font_size = sum(s["size"] for s in vspans) / len(vspans)
-                            if (
-                                avg_font_size > 12 and
-                                line_text.isupper() and
-                                len(line_text.split()) <= 5
-                            ):
-                                continue  # allow this line
-                            in_table = True
-                            break
-                    if in_table:
-                        continue
+                    avg_font_size = sum(s["size"] for s in vspans) / len(vspans)
 
-                    # --- Save cleaned line ---
-                    lines.append({
+                    page_lines.append(({
                         "text": line_text,
                         "x": x0,
                         "y": y0,
                         "font_size": vspans[0]["size"],
                         "page": i + 1
-                    })
+                    }, (x0, y0, x1, y1), avg_font_size))
+        extracted.append((i, page_lines, page.rect))
+
+    # --- Find tables of the extracted pages, until the table deadline ---
+    # PDFs on disk are searched in the page pool: in parallel, and a page
+    # on which find_tables runs away is killed at the deadline (or the
+    # page task timeout) instead of stalling the document. Documents given
+    # as bytes have no path to reopen in the workers and are searched
+    # in-process, with the budget only checked between pages.
+    table_boxes = {}
+    if stream is None and extracted:
+        from parallel_worker import find_page_tables
+
+        pool = get_worker_pool()
+        token = uuid.uuid4().hex
+        with trace.stage("find_tables"), pool.observe(trace.on_task, trace.sample_interval):
+            results = pool.map(
+                find_page_tables,
+                [(token, pdf_path, i) for i, _, _ in extracted],
+                deadline=budget.table_deadline(),
+            )
+        table_boxes = {i: boxes for (i, _, _), boxes in zip(extracted, results)}
+        missed = [i + 1 for i, boxes in table_boxes.items() if boxes is None]
+        if missed:
+            budget.degrade("skip_tables_on_pages", ",".join(map(str, missed)))
+    else:
+        for i, _, _ in extracted:
+            if not budget.allow_tables():
+                budget.degrade("skip_tables_from_page", i + 1)
+                break
+            with trace.stage("find_tables", i):
+                try:
+                    tables = doc[i].find_tables()
+                    table_boxes[i] = [table.bbox for table in tables.tables]
+                except Exception:
+                    table_boxes[i] = []
+
+    for i, page_lines, rect in extracted:
+        table_bboxes = table_boxes.get(i) or []
+        # Table box post-filtering: exclude very odd/small/huge bboxes
+        page_width, page_height = rect.width, rect.height
+        filtered_table_bboxes = []
+        for tb in table_bboxes:
+            x0, y0, x1, y1 = tb
+            width = x1 - x0
+            height = y1 - y0
+            # Filter: minimum height, max width percent (adjust as needed)
+            if height > 40 and width/page_width < 0.98:
+                filtered_table_bboxes.append(tb)
+        table_bboxes = filtered_table_bboxes
 
+        # --- Keep lines, skip those fully inside table boxes ---
+        lines = []
+        for line, line_bbox, avg_font_size in page_lines:
+            line_text = line["text"]
+            # --- Skip if inside any table bbox (unless it's a heading-like label) ---
+            in_table = False
+            for tbbox in table_bboxes:
+                if bbox_inside(line_bbox, tbbox, tol=2):
+                    if (
+                        avg_font_size > 12 and
+                        line_text.isupper() and
+                        len(line_text.split()) <= 5
+                    ):
+                        continue  # allow this line
+                    in_table = True
+                    break
+            if in_table:
+                continue
+
+            # --- Save cleaned line ---
+            lines.append(line)
 
         # --- Detect broken text, render page as needed ---
         cleaned_lines = [
@@ -234,41 +348,252 @@ def preprocess_pdf(pdf_path):
         ]
         page_text = "\n".join(cleaned_lines)
         is_broken = is_broken_text(page_text)
-        img = render_page_to_image(page) if is_broken else None
+        img = None
+        if is_broken:
+            if budget.allow_ocr():
+                with trace.stage("render", i):
+                    img = render_page_to_image(doc[i])
+            else:
+                budget.degrade("skip_ocr_from_page", i + 1)
+
+        trace.page(i).update({
+            "lines": len(lines),
+            "table_bboxes": [[round(v, 1) for v in tb] for tb in table_bboxes],
+            "broken_text": is_broken,
+            "ocr_image": img is not None,
+        })
 
         pre_data.append((i, lines, img, is_broken))
-
+        page_heights.append(page_height)
+        if drop_running or margins is not None:
+            fingerprints.append(page_fingerprint(lines, page_height))
+
+    # --- Drop running headers/footers before merging and ranking ---
+    if drop_running:
+        keys = running_keys(merge_fingerprints(fingerprints), total_pages=len(pre_data))
+        if keys:
+            pre_data = [
+                (i, drop_running_lines(lines, page_height, keys), img, is_broken)
+                for (i, lines, img, is_broken), page_height in zip(pre_data, page_heights)
+            ]
+            for i, lines, _, _ in pre_data:
+                trace.page(i)["lines_after_running_drop"] = len(lines)
+
+    if margins is not None:
+        margins.extend(zip(page_heights, fingerprints))
+
+    trace.set_total_pages(len(pre_data))
     return pre_data
 
 
 
-def extract_headings_hybrid(pdf_path):
-    from multiprocessing import Pool
-    from parallel_worker import process_page_with_optional_ocr
+def extract_heading_candidates(pdf_path=None, time_budget=None, merge_engine="bucket",
+                               stream=None, page_range=None, trace=None):
+    """
+    Extract and merge the heading candidates of a PDF (or of the pages in
+    `page_range`), before ranking. Returns a JSON-serializable dict with
+    the candidates in page order, the number of pages processed and the
+    degradations applied; see extract_headings_hybrid for the arguments.
+    """
+    import uuid
+    from parallel_worker import extract_page_statistics, merge_resident_pages, extract_and_merge_page
     from parallel_heading_merger import merge_headings_worker
-    from compute_dominant_gaps import compute_dynamic_thresholds_from_raw_lines
+    from compute_dominant_gaps import page_gap_histogram, compute_dynamic_thresholds_from_histograms
+    from time_budget import DocumentBudget
+    from diagnostics import NULL_TRACE
+    from heading_merger import MERGE_ENGINES
+
+    # Checked here: inside the workers the error would only turn into failed pages
+    if merge_engine not in MERGE_ENGINES:
+        raise ValueError(f"Unknown merge engine {merge_engine!r}; expected one of {MERGE_ENGINES}")
+
+    budget = DocumentBudget(time_budget)
+    trace = trace or NULL_TRACE
 
-    # --- PASS 1: Extract raw lines (parallel) ---
-    pre_data = preprocess_pdf(pdf_path)
-    args1 = [(i, lines, img, is_broken) for (i, lines, img, is_broken) in pre_data]
+    with trace.stage("preprocess"):
+        pre_data = preprocess_pdf(
+            pdf_path, budget=budget, stream=stream, page_range=page_range, trace=trace
+        )
+    ocr_deadline = budget.ocr_deadline()
+    page_args = [(i, lines, img, is_broken, ocr_deadline) for (i, lines, img, is_broken) in pre_data]
+
+    # Pages stay resident in the worker that extracted them: pass 1 returns
+    # only gap histograms, pass 2 merges in place once the global
+    # thresholds are known. Line data crosses the process boundary once.
+    doc_token = uuid.uuid4().hex
+    pool = get_worker_pool()
+
+    with pool.observe(trace.on_task, trace.sample_interval), pool.hold_workers():
+        # --- PASS 1: Extract pages (parallel), collect gap histograms ---
+        pass1_results = pool.map(
+            extract_page_statistics,
+            [(doc_token, args) for args in page_args],
+            deadline=budget.deadline,
+            return_workers=True,
+        )
+
+        histograms = []
+        pages_by_worker = defaultdict(list)
+        local_pages = {}  # text layer of pages whose pass-1 task failed
+        for (i, lines, img, _, _), (result, worker) in zip(page_args, pass1_results):
+            if result is None:
+                local_pages[i] = lines
+                histograms.append(page_gap_histogram(lines))
+                if img is not None:
+                    budget.degrade("skip_ocr_from_page", i + 1)
+                continue
+            histogram, ocr_skipped = result
+            histograms.append(histogram)
+            trace.page(i)["lines_after_ocr"] = sum(histogram["font"].values())
+            pages_by_worker[worker].append(i)
+            if ocr_skipped:
+                budget.degrade("skip_ocr_from_page", i + 1)
+
+        # --- Compute Dynamic Thresholds ---
+        thresholds = compute_dynamic_thresholds_from_histograms(histograms)
+        max_y_gap = thresholds["dyn_y_gap"]
+        max_x_gap = thresholds["dyn_x_gap"]
+
+        # --- PASS 2: Merge Headings where the pages live ---
+        workers = list(pages_by_worker)
+        pass2_results = pool.run_on(
+            [(worker, (doc_token, max_y_gap, max_x_gap, merge_engine)) for worker in workers],
+            merge_resident_pages,
+        )
+
+    merged_by_page = {}
+    lost_pages = []
+    for worker, result in zip(workers, pass2_results):
+        if result is None:
+            lost_pages.extend(pages_by_worker[worker])
+        else:
+            merged_by_page.update(result)
+
+    # Pages whose worker died in between are redone from scratch
+    args_by_page = {args[0]: args for args in page_args}
+    with pool.observe(trace.on_task, trace.sample_interval):
+        if lost_pages:
+            redone = pool.map(
+                extract_and_merge_page,
+                [(args_by_page[i], max_y_gap, max_x_gap, merge_engine) for i in lost_pages],
+            )
+            merged_by_page.update(zip(lost_pages, redone))
+        if local_pages:
+            merged_local = pool.map(
+                merge_headings_worker,
+                [(i, lines, max_y_gap, max_x_gap, merge_engine) for i, lines in local_pages.items()],
+            )
+            merged_by_page.update(zip(local_pages, merged_local))
+
+    # A page whose task failed for good (None) yields no candidates, but
+    # the outline must say so rather than silently come out shorter
+    failed_pages = sorted(i for i, merged in merged_by_page.items() if merged is None)
+    if failed_pages and len(failed_pages) == len(merged_by_page):
+        raise RuntimeError(f"heading extraction failed on all {len(failed_pages)} page(s)")
+    if failed_pages:
+        budget.degrade("failed_pages", ",".join(str(i + 1) for i in failed_pages))
+        for i in failed_pages:
+            merged_by_page[i] = []
+
+    for i, merged in merged_by_page.items():
+        trace.page(i)["candidates"] = len(merged)
+
+    return {
+        "headings": [heading for i in sorted(merged_by_page) for heading in merged_by_page[i]],
+        "pages": len(pre_data),
+        "degradations": budget.degradations,
+    }
+
+
+def extract_page_lines(pdf_path=None, time_budget=None, stream=None, page_range=None):
+    """
+    Phase 1 of a distributed run: extract the lines of the pages in
+    `page_range`, OCR included, but keep running headers/footers and leave
+    merging for later. Whether a margin line is running, and the gap
+    thresholds, depend on every page of the document; merge_page_lines
+    settles them once all ranges are in. Returns a JSON-serializable dict
+    with each page's text lines, OCR lines, height and margin fingerprint,
+    and the degradations applied.
+    """
+    from parallel_worker import process_page_with_optional_ocr
+    from time_budget import DocumentBudget
 
-    with Pool(8) as pool:
-        all_raw_lines_per_page = pool.map(process_page_with_optional_ocr, args1)
+    budget = DocumentBudget(time_budget)
+    margins = []
+    pre_data = preprocess_pdf(
+        pdf_path, budget=budget, drop_running=False, stream=stream,
+        page_range=page_range, margins=margins,
+    )
 
-    # --- Compute Dynamic Thresholds ---
-    thresholds = compute_dynamic_thresholds_from_raw_lines(all_raw_lines_per_page)
-    max_y_gap = thresholds["dyn_y_gap"]
-    max_x_gap = thresholds["dyn_x_gap"]
+    # Only pages rendered for OCR have anything to do in the pool
+    ocr_deadline = budget.ocr_deadline()
+    ocr_args = [(i, lines, img, True, ocr_deadline) for (i, lines, img, _) in pre_data if img is not None]
+    ocr_results = dict(zip(
+        (args[0] for args in ocr_args),
+        get_worker_pool().map(process_page_with_optional_ocr, ocr_args, deadline=budget.deadline),
+    ))
+
+    pages = []
+    for (i, lines, img, _), (page_height, fingerprint) in zip(pre_data, margins):
+        ocr_lines = []
+        if img is not None:
+            result = ocr_results[i]
+            if result is None or result[1]:
+                budget.degrade("skip_ocr_from_page", i + 1)
+            else:
+                ocr_lines = result[0][len(lines):]
+        pages.append({
+            "page": i,
+            "lines": lines,
+            "ocr_lines": ocr_lines,
+            "height": page_height,
+            "fingerprint": sorted(fingerprint),
+        })
+    return {"pages": pages, "degradations": budget.degradations}
+
+
+def merge_page_lines(pages, merge_engine="bucket"):
+    """
+    Phase 2 of a distributed run: given the pages of every range (from
+    extract_page_lines, in page order), drop running headers/footers and
+    compute the gap thresholds over the whole document, as a single-node
+    run does, then merge each page into heading candidates in the page pool.
+    Returns the candidates in page order and the degradations applied.
+    """
+    from parallel_heading_merger import merge_headings_worker
+    from compute_dominant_gaps import page_gap_histogram, compute_dynamic_thresholds_from_histograms
+    from running_elements import merge_fingerprints, running_keys, drop_running_lines
 
-    # --- PASS 2: Merge Headings (parallel) ---
-    args2 = [(i, raw_lines, max_y_gap, max_x_gap) for i, raw_lines in enumerate(all_raw_lines_per_page)]
+    keys = running_keys(
+        merge_fingerprints({tuple(key) for key in page["fingerprint"]} for page in pages),
+        total_pages=len(pages),
+    )
+    # OCR lines come after the text layer and are never dropped, as in preprocess_pdf
+    page_lines = [
+        (page["page"], drop_running_lines(page["lines"], page["height"], keys) + page["ocr_lines"])
+        for page in pages
+    ]
+    thresholds = compute_dynamic_thresholds_from_histograms(
+        page_gap_histogram(lines) for _, lines in page_lines
+    )
+    merged = get_worker_pool().map(
+        merge_headings_worker,
+        [(i, lines, thresholds["dyn_y_gap"], thresholds["dyn_x_gap"], merge_engine)
+         for i, lines in page_lines],
+    )
 
-    with Pool(8) as pool:
-        merged_lists = pool.map(merge_headings_worker, args2)
-        
+    degradations = []
+    failed_pages = [i + 1 for (i, _), headings in zip(page_lines, merged) if headings is None]
+    if failed_pages:
+        degradations.append(f"failed_pages:{','.join(map(str, failed_pages))}")
+    return {
+        "headings": [heading for headings in merged if headings for heading in headings],
+        "degradations": degradations,
+    }
 
-    merged_headings = [heading for page_list in merged_lists for heading in page_list]
 
+def build_outline(merged_headings, total_pages, degradations=None):
+    """Rank merged heading candidates (in page order) into the final outline."""
     # --- Rank & Post-process ---
     from heading_ranker import rank_all_headings
 
@@ -278,7 +603,6 @@ def extract_headings_hybrid(pdf_path):
 
     outline = []
     title = None
-    total_pages = len(all_raw_lines_per_page)
 
     for heading in merged:
         level = heading["level"]
@@ -300,7 +624,32 @@ def extract_headings_hybrid(pdf_path):
     )
     outline = normalize_heading_levels(outline)
 
-    return {
+    result = {
         "title": title if title else "Untitled Document",
         "outline": outline
     }
+    if degradations:
+        result["degradations"] = degradations
+    return result
+
+
+def extract_headings_hybrid(pdf_path=None, time_budget=None, merge_engine="bucket", stream=None,
+                            trace=None):
+    """
+    Extract the title and H1-H3 outline of a PDF, given by path or as bytes
+    in `stream`.
+
+    time_budget: optional wall-clock limit in seconds for the whole document.
+    When it runs short, OCR and table detection are skipped and trailing
+    pages are dropped; the applied degradations are listed in the result.
+    merge_engine: line merging strategy, "bucket" or "sweep" (see heading_merger).
+    trace: optional diagnostics.DocumentTrace collecting timings and
+    intermediate data for slow-document forensics.
+    """
+    from diagnostics import NULL_TRACE
+
+    candidates = extract_heading_candidates(
+        pdf_path, time_budget=time_budget, merge_engine=merge_engine, stream=stream, trace=trace
+    )
+    with (trace or NULL_TRACE).stage("rank"):
+        return build_outline(candidates["headings"], candidates["pages"], candidates["degradations"])
@@ -76,64 +76,103 @@ def process_data_list(data_list):
     return [clean_text_in_data(item.copy()) for item in data_list]
 
 
-def merge_candidate_headings(data, max_y_gap, max_x_gap):
+MERGE_ENGINES = ("bucket", "sweep")
+
+
+def merge_candidate_headings(data, max_y_gap, max_x_gap, engine="bucket"):
+    """
+    engine: "bucket" groups lines by rounded coordinates; "sweep" clusters
+    them by their actual gaps after one sort per page (see line_clustering).
+    """
+    if engine not in MERGE_ENGINES:
+        raise ValueError(f"Unknown merge engine: {engine!r}")
+
     cleaned_data = process_data_list(data)
     
-    merged = merge_lines_by_xy(cleaned_data, max_y_gap, max_x_gap)
-    merged = merge_lines_by_vertical_blocks(merged, max_y_gap, max_x_gap)
+    merged = merge_lines_by_xy(cleaned_data, max_y_gap, max_x_gap, engine=engine)
+    merged = merge_lines_by_vertical_blocks(merged, max_y_gap, max_x_gap, engine=engine)
 
     return merged
 
-# ------------------ Horizontal Line Merge (Same Y) ------------------ #
-def merge_lines_by_xy(lines, max_y_gap, max_x_gap):
-    y_buckets = defaultdict(list)
-    for item in lines:
-        y_key = round(item["y"] / max_y_gap)
-        y_buckets[y_key].append(item)
+def _stitch_row_fragments(fragments):
+    """Join the fragments of one row, left to right, dropping overlaps."""
+    result = ""
+    seen = set()
 
-    merged_output = []
+    def find_overlap(a, b):
+        """Return the length of the max overlap where b starts with end of a."""
+        max_overlap = 0
+        min_len = min(len(a), len(b))
+        for i in range(1, min_len + 1):
+            if a[-i:] == b[:i]:
+                max_overlap = i
+        return max_overlap
 
-    def smart_stitch_fragments(fragments):
-        result = ""
-        seen = set()
-
-        def find_overlap(a, b):
-            """Return the length of the max overlap where b starts with end of a."""
-            max_overlap = 0
-            min_len = min(len(a), len(b))
-            for i in range(1, min_len + 1):
-                if a[-i:] == b[:i]:
-                    max_overlap = i
-            return max_overlap
-
-        for frag in fragments:
-            if not frag or "text" not in frag or frag["text"] is None:
-                continue
+    for frag in fragments:
+        if not frag or "text" not in frag or frag["text"] is None:
+            continue
 
-            text = frag["text"].strip()
-        
-            if not text or text in seen:
-                continue
+        text = frag["text"].strip()
+    
+        if not text or text in seen:
+            continue
 
-            seen.add(text)
+        seen.add(text)
 
-            if not result:
-                result = text
-                continue
+        if not result:
+            result = text
+            continue
 
-            overlap_len = find_overlap(result, text)
+        overlap_len = find_overlap(result, text)
 
-            if overlap_len > 0:
-                result += text[overlap_len:]
+        if overlap_len > 0:
+            result += text[overlap_len:]
+        else:
+            if result[-1:].islower() and text[0].islower():
+                result += text
             else:
-                if result[-1:].islower() and text[0].islower():
-                    result += text
-                else:
-                    result += " " + text
+                result += " " + text
+
+    result = re.sub(r'\s+', ' ', result)
+    return result.strip()
 
-        result = re.sub(r'\s+', ' ', result)
-        return result.strip()
 
+def _stitch_block_fragments(fragments):
+    """Join the lines of one vertical block, top to bottom, dropping repeats."""
+    result = ""
+   
+    for frag in fragments:
+        text = frag["text"].strip()
+        if re.search(r'[\.\-\_\*=\s]{3,}', text):
+            continue
+        if not text:
+            continue
+        if text in result:
+            continue
+        max_overlap = 0
+        min_len = min(len(text), len(result))
+        for i in range(1, min_len + 1):
+            if result.endswith(text[:i]):
+                max_overlap = i
+        new_part = text[max_overlap:]
+        if new_part and new_part in result:
+            continue
+        result += " " + new_part
+    result = re.sub(r'(\b\w{3,}?)\1{2,}', r'\1', result)
+    return result.strip()
+
+
+# ------------------ Horizontal Line Merge (Same Y) ------------------ #
+def merge_lines_by_xy(lines, max_y_gap, max_x_gap, engine="bucket"):
+    if engine == "sweep":
+        return _merge_lines_by_xy_sweep(lines, max_y_gap)
+
+    y_buckets = defaultdict(list)
+    for item in lines:
+        y_key = round(item["y"] / max_y_gap)
+        y_buckets[y_key].append(item)
+
+    merged_output = []
 
     for group in y_buckets.values():
         sorted_group = sorted(group, key=lambda x: x["x"])
@@ -141,7 +180,7 @@ def merge_lines_by_xy(lines, max_y_gap, max_x_gap):
         if not filtered_group:
             continue
         base = filtered_group[0]
-        stitched_text = smart_stitch_fragments(filtered_group)
+        stitched_text = _stitch_row_fragments(filtered_group)
         merged_output.append({
             "text": stitched_text,
             "x": base["x"],
@@ -153,7 +192,10 @@ def merge_lines_by_xy(lines, max_y_gap, max_x_gap):
     return merged_output
 
 # ------------------ Vertical Block Merge (Same X + Font Size) ------------------ #
-def merge_lines_by_vertical_blocks(lines, max_y_gap, max_x_gap):
+def merge_lines_by_vertical_blocks(lines, max_y_gap, max_x_gap, engine="bucket"):
+    if engine == "sweep":
+        return _merge_lines_by_vertical_blocks_sweep(lines, max_y_gap, max_x_gap)
+
     x_font_buckets = defaultdict(list)
     for item in lines:
         x_key = round(item["x"] / (max_x_gap + 2))
@@ -163,33 +205,10 @@ def merge_lines_by_vertical_blocks(lines, max_y_gap, max_x_gap):
 
     merged_output = []
 
-    def smart_stitch_fragments(fragments):
-        result = ""
-       
-        for frag in fragments:
-            text = frag["text"].strip()
-            if re.search(r'[\.\-\_\*=\s]{3,}', line["text"].strip()):
-                continue
-            if not text:
-                continue
-            if text in result:
-                continue
-            max_overlap = 0
-            min_len = min(len(text), len(result))
-            for i in range(1, min_len + 1):
-                if result.endswith(text[:i]):
-                    max_overlap = i
-            new_part = text[max_overlap:]
-            if new_part and new_part in result:
-                continue
-            result += " " + new_part
-        result = re.sub(r'(\b\w{3,}?)\1{2,}', r'\1', result)
-        return result.strip()
-
     def flush_group(group):
         if not group:
             return
-        stitched_text = smart_stitch_fragments(group)
+        stitched_text = _stitch_block_fragments(group)
         base = group[0]
         merged_output.append({
             "text": stitched_text,
@@ -225,3 +244,55 @@ def merge_lines_by_vertical_blocks(lines, max_y_gap, max_x_gap):
         flush_group(curr_group)
 
     return merged_output
+
+
+# ------------------ Sweep-line variants ------------------ #
+# Same stitching as above, but rows and blocks come from line_clustering:
+# fragments merge when they are actually close, not when they happen to
+# round into the same bucket, and each page costs a single sort.
+
+def _merge_lines_by_xy_sweep(lines, max_y_gap):
+    from line_clustering import cluster_rows
+
+    filtered = [item for item in lines if item["text"].strip()]
+    merged_output = []
+
+    # Half the dominant line pitch: fragments of one row, never two rows
+    for row in cluster_rows(filtered, y_tolerance=max_y_gap / 2):
+        base = row[0]
+        merged_output.append({
+            "text": _stitch_row_fragments(row),
+            "x": base["x"],
+            "y": base["y"],
+            "font_size": base["font_size"],
+            "page": base["page"]
+        })
+
+    return merged_output
+
+
+def _merge_lines_by_vertical_blocks_sweep(lines, max_y_gap, max_x_gap):
+    from line_clustering import cluster_columns
+
+    candidates = [
+        line for line in lines
+        if not re.search(r'[\.\-\_\*=\s]{3,}', line["text"].strip())
+    ]
+    merged_output = []
+
+    blocks = cluster_columns(
+        candidates,
+        x_tolerance=(max_x_gap + 2) / 2,
+        y_gap=max_y_gap + max_y_gap * 0.2,
+    )
+    for block in blocks:
+        base = block[0]
+        merged_output.append({
+            "text": _stitch_block_fragments(block),
+            "x": base["x"],
+            "y": base["y"],
+            "font_size": base["font_size"],
+            "page": base["page"]
+        })
+
+    return merged_output
@@ -0,0 +1,107 @@
+"""
+Cold-start report for the container entry point: runs it in fresh
+interpreters under `python -X importtime` and prints the import time
+budget and the slowest modules. Given a PDF, the run also processes it,
+so the imports done lazily by each stage (and by the page workers) count.
+
+    python src/import_report.py [--repeat 5] [--top 15] [--no-bytecode] [some.pdf]
+
+--no-bytecode runs a fresh copy of the sources without __pycache__ every
+time, like an image that does not ship compiled bytecode.
+"""
+import os
+import sys
+import glob
+import shutil
+import argparse
+import subprocess
+import tempfile
+import time
+from statistics import median
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose import cost only some stages should pay
+WATCHED_MODULES = ("fitz", "PIL.Image", "pytesseract", "sqlite3", "zipfile", "tarfile", "multiprocessing")
+
+
+def parse_importtime(stderr):
+    """
+    Map each imported module to its cumulative import time in ms. The
+    total is the sum over top-level imports (nested ones are included in
+    their importer's cumulative time).
+    """
+    cumulative = {}
+    total = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        ms = int(cumulative_us) / 1000
+        if not name.startswith("  "):
+            total += ms
+        cumulative.setdefault(name.strip(), ms)
+    return cumulative, total
+
+
+def measure(statement, repeat, no_bytecode=False):
+    """Run `statement` `repeat` times; return per-run (wall ms, import ms, modules)."""
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as fresh:
+            cwd = SRC_DIR
+            flags = []
+            if no_bytecode:
+                for path in glob.glob(os.path.join(SRC_DIR, "*.py")):
+                    shutil.copy(path, fresh)
+                cwd, flags = fresh, ["-B"]
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, *flags, "-X", "importtime", "-c", statement],
+                cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+            )
+            wall = (time.perf_counter() - start) * 1000
+        modules, total = parse_importtime(proc.stderr)
+        runs.append((wall, total, modules))
+    return runs
+
+
+def report(title, runs, top):
+    print(f"\n== {title} ({len(runs)} runs, medians) ==")
+    print(f"process wall time: {median(r[0] for r in runs):8.1f} ms")
+    print(f"import time:       {median(r[1] for r in runs):8.1f} ms")
+
+    names = set().union(*(r[2] for r in runs))
+    per_module = {name: median(r[2].get(name, 0.0) for r in runs) for name in names}
+    print("slowest modules (cumulative ms):")
+    for name, ms in sorted(per_module.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {ms:8.1f}  {name}")
+
+    loaded = [m for m in WATCHED_MODULES if m in names]
+    skipped = [m for m in WATCHED_MODULES if m not in names]
+    print(f"loaded:     {', '.join(loaded) or '-'}")
+    print(f"not loaded: {', '.join(skipped) or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the cold-start import cost of main.py.")
+    parser.add_argument("pdf", nargs="?", help="also process this PDF and count the lazy imports")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per scenario (default: 5)")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list (default: 15)")
+    parser.add_argument("--no-bytecode", action="store_true",
+                        help="recompile the sources on every run, as without shipped bytecode")
+    args = parser.parse_args(argv)
+
+    report("import main", measure("import main", args.repeat, args.no_bytecode), args.top)
+
+    if args.pdf:
+        with tempfile.TemporaryDirectory() as out:
+            statement = (
+                "import main; "
+                f"main.process_all_pdfs([{os.path.abspath(args.pdf)!r}, '-o', {out!r}])"
+            )
+            report(f"process {os.path.basename(args.pdf)}", measure(statement, args.repeat, args.no_bytecode), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import os
+import sys
+import struct
+import fnmatch
+import zlib
+from collections import namedtuple
+
+# A PDF to process: `name` is its path relative to the input it came from,
+# under the archive's stem for archive members (used to name the output and
+# unique within a run); either `path` (a file on disk) or `data`
+# (the PDF bytes, for archive members and stdin) is set. `error` is set
+# instead when an archive or member could not be read, so the caller can
+# report it and move on.
+PdfSource = namedtuple("PdfSource", ["name", "path", "data", "error"], defaults=(None,))
+
+DEFAULT_INCLUDE = ("*.pdf",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+def _glob_match(name, pattern):
+    # Patterns apply to the relative path or to the bare file name
+    name, pattern = name.lower(), pattern.lower()
+    return fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(name.rsplit("/", 1)[-1], pattern)
+
+
+def _matches(name, include, exclude):
+    return (
+        any(_glob_match(name, p) for p in include)
+        and not any(_glob_match(name, p) for p in exclude)
+    )
+
+
+def _safe_name(name):
+    """Archive member name without absolute or parent-directory components."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return "/".join(parts)
+
+
+def _archive_stem(path):
+    base = os.path.basename(path)
+    for suffix in TAR_SUFFIXES + (".zip",):
+        if base.lower().endswith(suffix):
+            return base[:-len(suffix)] or base
+    return os.path.splitext(base)[0] or base
+
+
+def iter_directory(root, recursive=False, include=DEFAULT_INCLUDE, exclude=()):
+    if not recursive:
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if entry.is_file() and _matches(entry.name, include, exclude):
+                yield PdfSource(entry.name, entry.path, None)
+        return
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            if _matches(name, include, exclude):
+                yield PdfSource(name, path, None)
+
+
+def iter_zip(path, include=DEFAULT_INCLUDE, exclude=()):
+    """
+    Yield the PDFs of a zip archive, named `<archive stem>/<member>`.
+    Uncompressed (stored) members are copied out of a memory map of the
+    archive, so it is never read whole; the rest are inflated in memory.
+    Nothing is written to disk.
+    """
+    import mmap
+    import zipfile
+
+    stem = _archive_stem(path)
+    with open(path, "rb") as f, zipfile.ZipFile(f) as zf:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for info in zf.infolist():
+                name = _safe_name(info.filename)
+                if info.is_dir() or not name or not _matches(name, include, exclude):
+                    continue
+                name = f"{stem}/{name}"
+                try:
+                    if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                        header = _ZIP_LOCAL_HEADER.unpack_from(mapped, info.header_offset)
+                        start = info.header_offset + _ZIP_LOCAL_HEADER.size + header[10] + header[11]
+                        # A copy: fitz.open(stream=) takes bytes, not a memoryview
+                        data = mapped[start:start + info.compress_size]
+                    else:
+                        data = zf.read(info)
+                except Exception as e:  # encrypted, corrupt or unsupported member
+                    yield PdfSource(name, None, None, f"cannot read {name} in {path}: {e}")
+                    continue
+                yield PdfSource(name, None, data)
+        finally:
+            mapped.close()
+
+
+def iter_tar(fileobj=None, path=None, include=DEFAULT_INCLUDE, exclude=()):
+    """
+    Yield the PDFs of a (possibly compressed) tar archive, read as a
+    stream: members are handed over one at a time, without seeking. They
+    are named `<archive stem>/<member>`, or `stdin/<member>` for a stream.
+    """
+    import tarfile
+
+    stem = _archive_stem(path) if path else "stdin"
+
+    with tarfile.open(name=path, fileobj=fileobj, mode="r|*") as tf:
+        for member in tf:
+            name = _safe_name(member.name)
+            if not member.isfile() or not name or not _matches(name, include, exclude):
+                continue
+            yield PdfSource(f"{stem}/{name}", None, tf.extractfile(member).read())
+
+
+def iter_stdin(include=DEFAULT_INCLUDE, exclude=()):
+    """
+    stdin carries either a single PDF or a tar stream of PDFs. A single
+    PDF is named after its checksum, so different documents piped in over
+    several runs do not overwrite each other's output.
+    """
+    stream = sys.stdin.buffer
+    if stream.peek(5)[:5] == b"%PDF-":
+        data = stream.read()
+        yield PdfSource(f"stdin-{zlib.crc32(data):08x}.pdf", None, data)
+    else:
+        yield from iter_tar(fileobj=stream, include=include, exclude=exclude)
+
+
+def _is_zipfile(path):
+    import zipfile
+
+    return zipfile.is_zipfile(path)
+
+
+def iter_sources(inputs, recursive=False, include=DEFAULT_INCLUDE, exclude=()):
+    """
+    Yield a PdfSource for every PDF found in `inputs`: PDF files,
+    directories, zip or tar archives, or "-" for stdin. A PDF whose name
+    was already used in this run is skipped: both would write the same
+    output and fight over the same manifest entry.
+    """
+    seen = {}  # name -> input it came from
+    for spec in inputs:
+        try:
+            for source in _iter_spec(spec, recursive, include, exclude):
+                if source.name in seen:
+                    print(f"[!] Skipping {source.name} from {spec}: already read from {seen[source.name]}")
+                    continue
+                seen[source.name] = spec
+                yield source
+        except Exception as e:
+            # A truncated archive or unreadable stdin ends that input only;
+            # whatever it yielded before the error is kept
+            name = "stdin" if spec == "-" else os.path.basename(spec.rstrip("/")) or spec
+            path = spec if os.path.isfile(spec) else None
+            yield PdfSource(name, path, None, f"cannot read {spec}: {e}")
+
+
+def _iter_spec(spec, recursive, include, exclude):
+    if spec == "-":
+        yield from iter_stdin(include, exclude)
+    elif os.path.isdir(spec):
+        yield from iter_directory(spec, recursive, include, exclude)
+    elif spec.lower().endswith(TAR_SUFFIXES):
+        yield from iter_tar(path=spec, include=include, exclude=exclude)
+    elif spec.lower().endswith(".pdf") and os.path.isfile(spec):
+        yield PdfSource(os.path.basename(spec), spec, None)
+    elif _is_zipfile(spec):
+        yield from iter_zip(spec, include, exclude)
+    elif os.path.isfile(spec):
+        yield PdfSource(os.path.basename(spec), spec, None)
+    else:
+        print(f"[!] Skipping input that is neither a PDF, directory nor archive: {spec}")
+
+
+def source_fingerprint(source):
+    """Cheap identity of a source's content, to tell reruns what changed."""
+    if source.data is None and source.path is None:
+        return ""  # unreadable archive member or stdin
+    if source.data is not None:
+        return f"{len(source.data)}:{zlib.crc32(source.data):08x}"
+    stat = os.stat(source.path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+from contextlib import contextmanager
+
+# A claimed job is handed to another node once its lease runs out
+DEFAULT_LEASE_SECONDS = 120
+# A page range that failed this many times is given up on
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    source        TEXT NOT NULL,
+    fingerprint   TEXT NOT NULL,
+    path          TEXT NOT NULL,
+    total_pages   INTEGER NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'open',   -- open | assembled
+    owner         TEXT,                           -- node assembling it
+    lease_expires REAL,
+    enqueued_at   REAL NOT NULL,
+    PRIMARY KEY (source, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY,
+    source        TEXT NOT NULL,
+    fingerprint   TEXT NOT NULL,
+    first_page    INTEGER NOT NULL,
+    end_page      INTEGER NOT NULL,               -- exclusive
+    status        TEXT NOT NULL DEFAULT 'pending', -- pending | running | done | failed
+    owner         TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    seconds       REAL,
+    result        TEXT,
+    error         TEXT,
+    UNIQUE (source, fingerprint, first_page)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, lease_expires);
+"""
+
+
+def default_node_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Coordinator-free work distribution through one SQLite file on a shared
+    volume. Any node may enqueue documents (idempotently) and claim work;
+    claims are leases that expire if a node crashes or stops renewing them.
+
+    Large documents are split into page-range jobs. Once every range of a
+    document is finished, the next claim returns an assembly task for it,
+    which merges the pages of all ranges into the final outline.
+
+    Uses SQLite's default rollback journal: WAL mode does not work across
+    hosts sharing a network filesystem.
+    """
+
+    def __init__(self, path, node_id=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)  # idempotent; runs its own transactions
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    @contextmanager
+    def _write(self, conn=None):
+        """A write transaction that takes the database lock up front."""
+        conn = conn or self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def enqueue_document(self, source, fingerprint, path, total_pages, pages_per_job):
+        """Add a document and its page-range jobs unless already queued."""
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO documents (source, fingerprint, path, total_pages, enqueued_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (source, fingerprint, path, total_pages, time.time()),
+            )
+            if not cursor.rowcount:
+                return False
+            step = max(1, pages_per_job)
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (source, fingerprint, first_page, end_page)"
+                " VALUES (?, ?, ?, ?)",
+                [(source, fingerprint, first, min(first + step, total_pages))
+                 for first in range(0, max(total_pages, 1), step)],
+            )
+            return True
+
+    def is_known(self, source, fingerprint):
+        row = self._conn.execute(
+            "SELECT 1 FROM documents WHERE source = ? AND fingerprint = ?", (source, fingerprint)
+        ).fetchone()
+        return row is not None
+
+    def claim(self):
+        """
+        Lease the next piece of work for this node. Returns
+        ("assemble", document dict), ("extract", job dict) or None.
+        Assembly comes first so finished documents leave the queue early.
+        """
+        now = time.time()
+        expires = now + self.lease_seconds
+        with self._write() as conn:
+            # A range whose lease ran out MAX_ATTEMPTS times most likely kills
+            # the node processing it (segfault, OOM): give up instead of
+            # handing it on to crash the next node
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, lease_expires = NULL,"
+                " error = COALESCE(error, 'lease expired ' || attempts || ' times; node lost while processing')"
+                " WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            )
+            conn.row_factory = sqlite3.Row
+            try:
+                doc = conn.execute(
+                    "SELECT * FROM documents d WHERE"
+                    " (d.status = 'open' AND (d.owner IS NULL OR d.lease_expires < ?))"
+                    " AND NOT EXISTS (SELECT 1 FROM jobs j WHERE j.source = d.source"
+                    "   AND j.fingerprint = d.fingerprint AND j.status IN ('pending', 'running'))"
+                    " ORDER BY d.enqueued_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if doc is not None:
+                    conn.execute(
+                        "UPDATE documents SET owner = ?, lease_expires = ?"
+                        " WHERE source = ? AND fingerprint = ?",
+                        (self.node_id, expires, doc["source"], doc["fingerprint"]),
+                    )
+                    return "assemble", dict(doc)
+
+                job = conn.execute(
+                    "SELECT j.*, d.path, d.total_pages FROM jobs j JOIN documents d"
+                    " ON j.source = d.source AND j.fingerprint = d.fingerprint"
+                    " WHERE j.status = 'pending' OR (j.status = 'running' AND j.lease_expires < ?)"
+                    " ORDER BY j.id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if job is None:
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, lease_expires = ?,"
+                    " attempts = attempts + 1 WHERE id = ?",
+                    (self.node_id, expires, job["id"]),
+                )
+                return "extract", dict(job)
+            finally:
+                conn.row_factory = None
+
+    def renew(self, kind, key):
+        """Extend this node's lease on a claimed job or assembly."""
+        conn = self._connect()  # called from the heartbeat thread
+        try:
+            with self._write(conn):
+                if kind == "extract":
+                    conn.execute(
+                        "UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                        (time.time() + self.lease_seconds, key, self.node_id),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE documents SET lease_expires = ?"
+                        " WHERE source = ? AND fingerprint = ? AND owner = ? AND status = 'open'",
+                        (time.time() + self.lease_seconds, *key, self.node_id),
+                    )
+        finally:
+            conn.close()
+
+    def complete(self, job_id, result, seconds):
+        """Store a page range's extracted pages. False if the lease was lost meanwhile."""
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, seconds = ?, error = NULL"
+                " WHERE id = ? AND owner = ? AND status = 'running'",
+                (json.dumps(result, ensure_ascii=False), seconds, job_id, self.node_id),
+            )
+            return bool(cursor.rowcount)
+
+    def fail(self, job_id, error):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE jobs SET error = ?, owner = NULL, lease_expires = NULL,"
+                " status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END"
+                " WHERE id = ? AND owner = ? AND status = 'running'",
+                (error, MAX_ATTEMPTS, job_id, self.node_id),
+            )
+
+    def range_results(self, source, fingerprint):
+        """All page-range jobs of a document, in page order."""
+        self._conn.row_factory = sqlite3.Row
+        try:
+            rows = self._conn.execute(
+                "SELECT first_page, end_page, status, seconds, result, error FROM jobs"
+                " WHERE source = ? AND fingerprint = ? ORDER BY first_page",
+                (source, fingerprint),
+            ).fetchall()
+        finally:
+            self._conn.row_factory = None
+        return [
+            {**dict(row), "result": json.loads(row["result"]) if row["result"] else None}
+            for row in rows
+        ]
+
+    def mark_assembled(self, source, fingerprint):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE documents SET status = 'assembled', owner = ?, lease_expires = NULL"
+                " WHERE source = ? AND fingerprint = ?",
+                (self.node_id, source, fingerprint),
+            )
+
+    def unfinished(self):
+        """Number of documents not assembled yet (by any node)."""
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM documents WHERE status = 'open'"
+        ).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,55 @@
+def _sweep(items, key, max_gap):
+    """
+    Split items already sorted by `key` into runs whose consecutive keys
+    are at most `max_gap` apart.
+    """
+    groups = []
+    current = []
+    prev = None
+
+    for item in items:
+        value = key(item)
+        if current and value - prev > max_gap:
+            groups.append(current)
+            current = []
+        current.append(item)
+        prev = value
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+def cluster_rows(lines, y_tolerance):
+    """
+    Group fragments that sit on the same text row.
+
+    One sort by y, then a sweep that starts a new row wherever the vertical
+    distance to the previous fragment exceeds `y_tolerance`. Rows are
+    returned top to bottom, each sorted left to right.
+    """
+    by_y = sorted(lines, key=lambda l: l["y"])
+    return [
+        sorted(row, key=lambda l: l["x"])
+        for row in _sweep(by_y, lambda l: l["y"], y_tolerance)
+    ]
+
+
+def cluster_columns(lines, x_tolerance, y_gap):
+    """
+    Group lines into vertical blocks of the same font size.
+
+    Lines are sorted once by (font size, x); a sweep over x splits each font
+    size into columns wherever the horizontal distance exceeds
+    `x_tolerance`, and a sweep over y splits each column into blocks
+    wherever the vertical gap exceeds `y_gap`. Blocks are sorted top to
+    bottom.
+    """
+    by_font_x = sorted(lines, key=lambda l: (round(l["font_size"], 1), l["x"]))
+
+    blocks = []
+    for font_run in _sweep(by_font_x, lambda l: round(l["font_size"], 1), 0):
+        for column in _sweep(font_run, lambda l: l["x"], x_tolerance):
+            column.sort(key=lambda l: l["y"])
+            blocks.extend(_sweep(column, lambda l: l["y"], y_gap))
+    return blocks
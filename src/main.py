@@ -1,6 +1,9 @@
-from heading_extractor import extract_headings_hybrid
+from heading_extractor import extract_headings_hybrid, shutdown_worker_pool
+from input_sources import iter_sources, source_fingerprint, DEFAULT_INCLUDE
+from output_sinks import JsonFileSink, JsonlSink, SqliteSink, Manifest, MANIFEST_NAME, manifest_record
+from diagnostics import DocumentTrace, NULL_TRACE
+import argparse
 import time
-import json
 import os
 
 # Define the primary input directory and the fallback directory
@@ -11,6 +14,13 @@ FALLBACK_INPUT_DIR = "/app/sample_dataset/pdfs"
 PRIMARY_OUTPUT_DIR = "/app/output"
 FALLBACK_OUTPUT_DIR = "/app/sample_dataset/outputs"
 
+# A document slower than this many seconds per page gets a diagnostics dump
+SLOW_SECONDS_PER_PAGE = 1.0
+
+# Per-document latency budget in seconds (0 disables it). Documents that run
+# over it are still written, with the applied degradations listed.
+DOCUMENT_TIME_BUDGET = float(os.environ.get("DOCUMENT_TIME_BUDGET", "60"))
+
 
 def get_dirs_to_use():
     """
@@ -42,45 +52,217 @@ def get_dirs_to_use():
         return FALLBACK_INPUT_DIR, FALLBACK_OUTPUT_DIR
 
 
-def process_all_pdfs():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract title and outline from PDFs.")
+    parser.add_argument(
+        "inputs", nargs="*",
+        help="PDF files, directories, .zip/.tar archives, or - for stdin "
+             "(default: the primary or fallback input directory)",
+    )
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="walk input directories recursively")
+    parser.add_argument("--include", action="append",
+                        help=f"glob of files to process (repeatable, default: {' '.join(DEFAULT_INCLUDE)})")
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="glob of files to skip (repeatable)")
+    parser.add_argument("-o", "--output-dir",
+                        help="directory for per-file JSON results")
+    sink = parser.add_mutually_exclusive_group()
+    sink.add_argument("--jsonl",
+                      help="append all results as JSON lines to this file instead")
+    sink.add_argument("--sqlite",
+                      help="store all results in this SQLite database instead")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="results per write/commit for --jsonl and --sqlite, and per "
+                             "manifest update for per-file JSON (default: 100)")
+    parser.add_argument("--compact", action="store_true",
+                        help="write per-file JSON without indentation")
+    parser.add_argument("--fsync", action="store_true",
+                        help="fsync per-file JSON before the manifest records it "
+                             "(survives machine crashes; slower on network storage)")
+    parser.add_argument("--manifest",
+                        help=f"per-document status log (default: {MANIFEST_NAME} in the output directory, "
+                             f"or <file>{MANIFEST_NAME} for --jsonl/--sqlite)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip documents the manifest records as done with the same content")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and process PDFs as they appear in the input directory")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="seconds between directory scans in --watch mode (default: 1)")
+    parser.add_argument("--settle-seconds", type=float, default=2.0,
+                        help="seconds a file must stay unchanged before it is processed (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=2,
+                        help="documents processed at once in --watch mode (default: 2)")
+    parser.add_argument("--distributed", metavar="JOB_DB",
+                        help="share the work on the input directory with other nodes "
+                             "through this SQLite job store on a shared volume")
+    parser.add_argument("--node-id",
+                        help="name of this node in --distributed mode (default: host-pid)")
+    parser.add_argument("--pages-per-job", type=int, default=50,
+                        help="split larger documents into page ranges of this size (default: 50)")
+    parser.add_argument("--lease-seconds", type=float, default=120,
+                        help="time after which a silent node's job is reassigned (default: 120)")
+    parser.add_argument("--diagnostics-dir",
+                        help="trace every document and keep stage timings, per-page data and "
+                             "sampled stacks of the slow ones in this directory")
+    parser.add_argument("--slow-seconds-per-page", type=float, default=SLOW_SECONDS_PER_PAGE,
+                        help=f"what counts as slow for --diagnostics-dir (default: {SLOW_SECONDS_PER_PAGE:g})")
+    return parser.parse_args(argv)
+
+
+def open_sink(args, output_dir, manifest_name=MANIFEST_NAME):
+    """Build the output sink chosen on the command line, with its manifest."""
+    if args.jsonl or args.sqlite:
+        target = args.jsonl or args.sqlite
+        # Named after the target, so sinks sharing a directory keep separate manifests
+        manifest_path = args.manifest or os.path.abspath(target) + manifest_name
+    else:
+        manifest_path = args.manifest or os.path.join(output_dir, manifest_name)
+    manifest = Manifest(manifest_path)
+
+    if args.jsonl:
+        return JsonlSink(args.jsonl, batch_size=args.batch_size, manifest=manifest)
+    if args.sqlite:
+        return SqliteSink(args.sqlite, batch_size=args.batch_size, manifest=manifest)
+    return JsonFileSink(
+        output_dir, compact=args.compact, manifest=manifest,
+        batch_size=args.batch_size, fsync=args.fsync,
+    )
+
+
+def process_all_pdfs(argv=None):
     """
-    Processes all PDF files found in the determined input directory
-    and saves the output to the determined output directory.
+    Processes all PDF files found in the given inputs (or, by default, the
+    determined input directory) and saves the output through the chosen
+    sink: per-file JSON in the output directory, JSONL or SQLite.
     """
-    input_dir_to_use, output_dir_to_use = get_dirs_to_use()
+    args = parse_args(argv)
 
-    # Ensure the output directory exists
-    os.makedirs(output_dir_to_use, exist_ok=True)
+    inputs = args.inputs
+    output_dir_to_use = args.output_dir
+    if not inputs:
+        input_dir_to_use, default_output_dir = get_dirs_to_use()
+        inputs = [input_dir_to_use]
+        output_dir_to_use = output_dir_to_use or default_output_dir
+    elif not output_dir_to_use:
+        output_dir_to_use = PRIMARY_OUTPUT_DIR if os.path.isdir(PRIMARY_OUTPUT_DIR) else "output"
 
-    pdf_files = [
-        f for f in os.listdir(input_dir_to_use) if f.lower().endswith(".pdf")
-    ]
+    if args.distributed:
+        from distributed import run_node
+        from job_queue import JobQueue
 
-    if not pdf_files:
-        print(f"No PDF files found in {input_dir_to_use}. Exiting.")
+        if len(inputs) != 1 or not os.path.isdir(inputs[0]):
+            print("[!] --distributed needs exactly one input directory.")
+            return
+        queue = JobQueue(args.distributed, node_id=args.node_id, lease_seconds=args.lease_seconds)
+        # One manifest per node: nodes never append to the same file
+        with open_sink(args, output_dir_to_use, manifest_name=f".manifest.{queue.node_id}.jsonl") as sink:
+            run_node(
+                queue,
+                inputs[0],
+                sink,
+                pages_per_job=args.pages_per_job,
+                recursive=args.recursive,
+                include=args.include or DEFAULT_INCLUDE,
+                exclude=args.exclude,
+                time_budget=DOCUMENT_TIME_BUDGET or None,
+            )
+        queue.close()
+        stats = shutdown_worker_pool()
+        if stats:
+            print("\nWorker pool: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
         return
 
-    for pdf_file in pdf_files:
-        input_path = os.path.join(input_dir_to_use, pdf_file)
-        base_name = os.path.splitext(pdf_file)[0]
-        output_path = os.path.join(output_dir_to_use, f"{base_name}.json")
+    sink = open_sink(args, output_dir_to_use)
 
-        try:
-            print(f"\n[+] Processing: {pdf_file}")
+    if args.watch:
+        from watcher import watch_directory
+        from heading_extractor import WORKER_POOL_SIZE
+
+        if len(inputs) != 1 or not os.path.isdir(inputs[0]):
+            print("[!] --watch needs exactly one input directory.")
+            return
+        with sink:
+            watch_directory(
+                inputs[0],
+                sink,
+                recursive=args.recursive,
+                include=args.include or DEFAULT_INCLUDE,
+                exclude=args.exclude,
+                poll_interval=args.poll_interval,
+                settle_seconds=args.settle_seconds,
+                concurrency=max(1, args.concurrency),
+                total_page_workers=WORKER_POOL_SIZE,
+                time_budget=DOCUMENT_TIME_BUDGET or None,
+            )
+        return
+
+    sources = iter_sources(
+        inputs,
+        recursive=args.recursive,
+        include=args.include or DEFAULT_INCLUDE,
+        exclude=args.exclude,
+    )
+
+    processed = 0
+    skipped = 0
+    with sink:
+        for source in sources:
+            processed += 1
+            if source.error:
+                sink.record_failure(
+                    manifest_record(source.name, source_fingerprint(source), "failed", 0.0, error=source.error)
+                )
+                print(f"[!] Failed to read {source.name}: {source.error}")
+                continue
+
+            fingerprint = source_fingerprint(source)
+            if args.resume and sink.manifest.succeeded(source.name, fingerprint):
+                skipped += 1
+                continue
+
+            trace = DocumentTrace() if args.diagnostics_dir else NULL_TRACE
             start = time.perf_counter()
+            try:
+                print(f"\n[+] Processing: {source.name}")
+
+                with trace.sampling():
+                    result = extract_headings_hybrid(
+                        source.path,
+                        time_budget=DOCUMENT_TIME_BUDGET or None,
+                        stream=source.data,
+                        trace=trace,
+                    )
+
+                elapsed = time.perf_counter() - start
+                if args.diagnostics_dir and elapsed / max(trace.total_pages, 1) > args.slow_seconds_per_page:
+                    target = trace.dump(args.diagnostics_dir, source.name, elapsed, result)
+                    print(f"    slow ({elapsed / max(trace.total_pages, 1):.2f} s/page), diagnostics in {target}")
+                sink.write(
+                    source.name, result,
+                    manifest_record(source.name, fingerprint, "ok", elapsed, result=result),
+                )
+                print(f"[✓] Saved to: {sink.location(source.name)}  ⏱ {elapsed:.2f} seconds")
+                if result.get("degradations"):
+                    print(f"    degraded: {', '.join(result['degradations'])}")
 
-            result = extract_headings_hybrid(input_path)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                sink.record_failure(
+                    manifest_record(source.name, fingerprint, "failed", elapsed, error=str(e))
+                )
+                print(f"[!] Failed to process {source.name}: {e}")
 
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+    if skipped:
+        print(f"\nSkipped {skipped} document(s) already done according to the manifest.")
 
-            end = time.perf_counter()
-            elapsed = end - start
-            print(f"[✓] Saved to: {output_path}  ⏱ {elapsed:.2f} seconds")
+    if not processed:
+        print(f"No PDF files found in {', '.join(inputs)}. Exiting.")
 
-        except Exception as e:
-            print(f"[!] Failed to process {pdf_file}: {e}")
+    stats = shutdown_worker_pool()
+    if stats:
+        print("\nWorker pool: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
 
 
 if __name__ == "__main__":
-    process_all_pdfs()
\ No newline at end of file
+    process_all_pdfs()
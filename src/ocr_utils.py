@@ -1,4 +1,3 @@
-from PIL import Image
 import io
 
 def is_broken_text(text: str, debug=False):
@@ -21,11 +20,13 @@ def is_broken_text(text: str, debug=False):
     return False
 
 def render_page_to_image(page):
+    from PIL import Image  # only pages that need OCR pay for PIL
+
     pix = page.get_pixmap(dpi=150)
     mode = "RGB" if pix.alpha == 0 else "RGBA"
     return Image.frombytes(mode, [pix.width, pix.height], pix.samples)
 
-def perform_ocr_data(image: Image.Image, page_num: int = 1):
+def perform_ocr_data(image: "Image.Image", page_num: int = 1):
     import pytesseract
     from pytesseract import Output, image_to_data
     from collections import defaultdict
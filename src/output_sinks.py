@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import tempfile
+
+MANIFEST_NAME = ".manifest.jsonl"
+
+
+def encode_result(result, compact=False):
+    if compact:
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(result, ensure_ascii=False, indent=2)
+
+
+class Manifest:
+    """
+    Append-only JSONL log of one record per processed document: source
+    name, fingerprint, status ("ok"/"failed"), timing and degradations.
+    The last record of a source wins, so reruns can skip what already
+    succeeded with the same fingerprint.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    if record.get("status") == "ok":
+                        self.done[record["source"]] = record.get("fingerprint")
+                    else:
+                        self.done.pop(record["source"], None)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def succeeded(self, source, fingerprint):
+        return source in self.done and self.done[source] == fingerprint
+
+    def record(self, records):
+        self._file.write("".join(encode_result(r, compact=True) + "\n" for r in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for r in records:
+            if r["status"] == "ok":
+                self.done[r["source"]] = r.get("fingerprint")
+
+    def close(self):
+        self._file.close()
+
+
+def manifest_record(source, fingerprint, status, seconds, result=None, error=None):
+    record = {
+        "source": source,
+        "fingerprint": fingerprint,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if result and result.get("degradations"):
+        record["degradations"] = result["degradations"]
+    if error:
+        record["error"] = error
+    return record
+
+
+class _BatchedSink:
+    """
+    Buffers results and their manifest records, and persists them in
+    batches: the manifest is only told a document succeeded after its
+    result is durable, so a crash can cost a rerun but never a result.
+    """
+
+    def __init__(self, batch_size=100, manifest=None):
+        self.batch_size = max(1, batch_size)
+        self.manifest = manifest
+        self._results = []
+        self._records = []
+
+    def location(self, name):
+        raise NotImplementedError
+
+    def write(self, name, result, record=None):
+        self._results.append((name, result))
+        if record is not None:
+            self._records.append(record)
+        if len(self._results) >= self.batch_size:
+            self.flush()
+
+    def record_failure(self, record):
+        self._records.append(record)
+        if not self._results:
+            self.flush()
+
+    def _persist(self, batch):
+        raise NotImplementedError
+
+    def _sync(self):
+        """Make results persisted since the last flush durable (if not already)."""
+
+    def flush(self):
+        if self._results:
+            self._persist(self._results)
+            self._results = []
+        if self._records and self.manifest:
+            self._sync()
+            self.manifest.record(self._records)
+        self._records = []
+
+    def close(self):
+        self.flush()
+        if self.manifest:
+            self.manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JsonFileSink(_BatchedSink):
+    """
+    One JSON file per document, written to a temp file and renamed into
+    place as soon as the document is done. Only the manifest records are
+    batched. With `fsync`, each file is fsynced before its rename and the
+    directories once per batch, before the manifest records the batch;
+    without it, results survive a crash of this process but not of the
+    machine, which spares network storage a sync per document.
+    """
+
+    def __init__(self, output_dir, compact=False, manifest=None, batch_size=100, fsync=False):
+        super().__init__(batch_size=batch_size, manifest=manifest)
+        self.output_dir = output_dir
+        self.compact = compact
+        self.fsync = fsync
+        self._written = 0
+        self._unsynced_dirs = set()
+        os.makedirs(output_dir, exist_ok=True)
+        self._umask = os.umask(0)  # the only way to read the umask is to set it
+        os.umask(self._umask)
+
+    def location(self, name):
+        return os.path.join(self.output_dir, f"{os.path.splitext(name)[0]}.json")
+
+    def write(self, name, result, record=None):
+        self._persist([(name, result)])
+        if record is not None:
+            self._records.append(record)
+        self._written += 1
+        if self._written >= self.batch_size:
+            self.flush()
+
+    def _persist(self, batch):
+        for name, result in batch:
+            path = self.location(name)
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+            try:
+                # mkstemp creates 0600 files; use what open() would have given
+                os.fchmod(fd, 0o666 & ~self._umask)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(encode_result(result, self.compact))
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._unsynced_dirs.add(directory)
+
+    def _sync(self):
+        if self.fsync:
+            for directory in self._unsynced_dirs:
+                _fsync_directory(directory)
+        self._unsynced_dirs.clear()
+        self._written = 0
+
+
+class JsonlSink(_BatchedSink):
+    """All documents appended to one JSONL file, fsynced once per batch."""
+
+    def __init__(self, path, batch_size=100, manifest=None):
+        super().__init__(batch_size=batch_size, manifest=manifest)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def location(self, name):
+        return self.path
+
+    def _persist(self, batch):
+        self._file.write("".join(
+            encode_result({"source": name, **result}, compact=True) + "\n"
+            for name, result in batch
+        ))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class SqliteSink(_BatchedSink):
+    """All documents in one SQLite table, committed once per batch."""
+
+    def __init__(self, path, batch_size=100, manifest=None):
+        super().__init__(batch_size=batch_size, manifest=manifest)
+        self.path = path
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outlines ("
+            " source TEXT PRIMARY KEY, title TEXT, result TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def location(self, name):
+        return f"{self.path}#{name}"
+
+    def _persist(self, batch):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO outlines (source, title, result) VALUES (?, ?, ?)",
+                [(name, result.get("title"), encode_result(result, compact=True))
+                 for name, result in batch],
+            )
+
+    def close(self):
+        super().close()
+        self._conn.close()
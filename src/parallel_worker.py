@@ -1,8 +1,22 @@
+import time
+
+# Pages extracted by this worker and awaiting the merge pass, keyed by
+# document token and then page index. A worker serves one document at a time.
+_resident_pages = {}
+
+# Documents opened by this worker for table detection, keyed by token
+_open_documents = {}
+
+
 def process_page_with_optional_ocr(args):
-    page_index, raw_lines, image, is_broken = args
+    page_index, raw_lines, image, is_broken, ocr_deadline = args
     page_number = page_index + 1
 
     if is_broken and image:
+        if ocr_deadline is not None and time.time() >= ocr_deadline:
+            # Document is over its time budget: keep the text layer only
+            return raw_lines, True
+
         from ocr_utils import perform_ocr_data
 
         ocr_words = perform_ocr_data(image)
@@ -16,4 +30,65 @@ def process_page_with_optional_ocr(args):
                     "page": page_number
                 })
 
-    return raw_lines
\ No newline at end of file
+    return raw_lines, False
+
+
+def find_page_tables(args):
+    """
+    Table boxes of one page. Runs in a worker so that a page on which
+    find_tables runs away can be killed without stalling the document.
+    """
+    import fitz  # PyMuPDF
+
+    doc_token, pdf_path, page_index = args
+    doc = _open_documents.get(doc_token)
+    if doc is None:
+        for stale in _open_documents.values():
+            stale.close()
+        _open_documents.clear()
+        doc = _open_documents[doc_token] = fitz.open(pdf_path)
+    try:
+        tables = doc[page_index].find_tables()
+        return [table.bbox for table in tables.tables]
+    except Exception:
+        return []
+
+
+def extract_page_statistics(args):
+    """
+    Pass 1 of the worker-affine protocol: extract a page, keep its lines in
+    this worker and return only its gap histograms and OCR-skip flag.
+    """
+    from compute_dominant_gaps import page_gap_histogram
+
+    doc_token, page_args = args
+    for stale_token in [t for t in _resident_pages if t != doc_token]:
+        del _resident_pages[stale_token]
+
+    raw_lines, ocr_skipped = process_page_with_optional_ocr(page_args)
+    _resident_pages.setdefault(doc_token, {})[page_args[0]] = raw_lines
+    return page_gap_histogram(raw_lines), ocr_skipped
+
+
+def merge_resident_pages(args):
+    """
+    Pass 2 of the worker-affine protocol: merge every page this worker kept
+    for the document, using the global thresholds, and release them.
+    """
+    from parallel_heading_merger import merge_headings_worker
+
+    doc_token, max_y_gap, max_x_gap, engine = args
+    pages = _resident_pages.pop(doc_token, {})
+    return {
+        page_index: merge_headings_worker((page_index, raw_lines, max_y_gap, max_x_gap, engine))
+        for page_index, raw_lines in pages.items()
+    }
+
+
+def extract_and_merge_page(args):
+    """Both passes for one page, for pages whose resident state was lost."""
+    from parallel_heading_merger import merge_headings_worker
+
+    page_args, max_y_gap, max_x_gap, engine = args
+    raw_lines, _ = process_page_with_optional_ocr(page_args)
+    return merge_headings_worker((page_args[0], raw_lines, max_y_gap, max_x_gap, engine))
@@ -0,0 +1,88 @@
+import re
+import hashlib
+from collections import Counter
+
+# Only lines in the top/bottom margin of a page can be running headers/footers
+MARGIN_FRACTION = 0.12
+# Page-relative vertical position is quantized into this many bands
+Y_BANDS = 50
+# Left edges are quantized into buckets this many points wide
+X_STEP = 12
+# A (text and font, y band, x bucket) key is "running" once it repeats on this share of the pages...
+REPEAT_FRACTION = 0.5
+# ...and on at least this many pages
+MIN_PAGES = 3
+
+
+# Only page counters are masked, so "Page 3 of 10" and "Page 4 of 10" look
+# the same while numbered headings like "Chapter 3" keep their number
+_COUNTERS = [
+    (re.compile(r'\d+\s*(of|/)\s*\d+'), r'# \1 #'),
+    (re.compile(r'\b(page|pg\.?|p\.)\s*\d+'), r'\1 #'),
+    (re.compile(r'^[\-–—\s]*\d+[\-–—\s]*$'), '#'),
+]
+
+
+def _normalize(text):
+    text = re.sub(r'\s+', ' ', text.strip().lower())
+    for pattern, replacement in _COUNTERS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def line_key(line, page_height):
+    """(text and font hash, y band, x bucket) of a margin line, or None for body lines."""
+    if not page_height:
+        return None
+    rel_y = line["y"] / page_height
+    if MARGIN_FRACTION < rel_y < 1 - MARGIN_FRACTION:
+        return None
+    norm = _normalize(line["text"])
+    if not norm:
+        return None
+    font = round(line.get("font_size", 0) * 2) / 2
+    digest = hashlib.blake2b(f"{norm}|{font}".encode("utf-8"), digest_size=8).hexdigest()
+    return digest, int(rel_y * Y_BANDS), int(line["x"] // X_STEP)
+
+
+def page_fingerprint(lines, page_height):
+    """Set of margin-line keys on one page; cheap to ship between processes."""
+    keys = set()
+    for line in lines:
+        key = line_key(line, page_height)
+        if key is not None:
+            keys.add(key)
+    return keys
+
+
+def merge_fingerprints(fingerprints, counts=None):
+    """
+    Count on how many pages each key occurs. A key also counts for its
+    neighbouring bands and x buckets, so a footer that shifts a little (or
+    a centered page number that gains a digit) still matches.
+    Counts from separate batches of pages can be merged with `+`.
+    """
+    counts = Counter() if counts is None else counts
+    for keys in fingerprints:
+        expanded = {
+            (digest, band + dy, bucket + dx)
+            for digest, band, bucket in keys
+            for dy in (-1, 0, 1)
+            for dx in (-1, 0, 1)
+        }
+        counts.update(expanded)
+    return counts
+
+
+def running_keys(counts, total_pages):
+    """Keys that repeat often enough to be running headers/footers."""
+    if total_pages < MIN_PAGES:
+        return set()
+    min_pages = max(MIN_PAGES, int(REPEAT_FRACTION * total_pages))
+    return {key for key, pages in counts.items() if pages >= min_pages}
+
+
+def drop_running_lines(lines, page_height, keys):
+    if not keys:
+        return lines
+    return [line for line in lines if line_key(line, page_height) not in keys]
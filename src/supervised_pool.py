@@ -0,0 +1,309 @@
+import os
+import time
+import itertools
+import multiprocessing as mp
+from collections import Counter, deque
+from contextlib import contextmanager
+from multiprocessing.connection import wait
+
+
+def _current_rss_mb():
+    """Resident set size of the calling process in MB (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _worker_main(conn):
+    """Run tasks sent over `conn` until told to stop or the pipe closes."""
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        func, args, sample_interval = message
+
+        sampler = None
+        if sample_interval:
+            from diagnostics import StackSampler
+
+            sampler = StackSampler(sample_interval, root="_worker_main")
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            outcome = ("ok", func(args))
+        except Exception as e:
+            outcome = ("error", f"{type(e).__name__}: {e}")
+        seconds = time.perf_counter() - start
+        stacks = sampler.stop() if sampler else None
+
+        conn.send((outcome, _current_rss_mb(), seconds, stacks))
+
+
+class _Worker:
+    _idents = itertools.count(1)
+
+    def __init__(self, ctx):
+        self.ident = next(self._idents)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+        self.task = None  # (item index, attempt) while busy
+        self.started_at = None
+        self.recycle_due = False
+
+    def send(self, func, item, task, sample_interval=None):
+        self.task = task
+        self.started_at = time.monotonic()
+        self.conn.send((func, item, sample_interval))
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SupervisedPool:
+    """
+    Process pool that keeps `map` making progress when workers misbehave.
+
+    - Tasks running longer than `task_timeout` seconds get their worker
+      killed and respawned.
+    - A task that timed out, raised or crashed its worker is retried
+      `retries` times, then replaced by the caller's fallback value.
+    - Workers are recycled after `max_tasks_per_worker` tasks or once their
+      RSS exceeds `max_rss_mb`, which releases MuPDF's store and any leaks.
+
+    `stats` counts each of these events over the lifetime of the pool.
+
+    Tasks may leave state behind in the worker that ran them: `map` can
+    report which worker produced each result, and `run_on` sends follow-up
+    tasks to those same workers. Recycling is postponed inside
+    `hold_workers()` so that such state is not thrown away in between.
+    """
+
+    def __init__(self, processes=8, task_timeout=None, max_tasks_per_worker=None,
+                 max_rss_mb=None, retries=1):
+        self.processes = processes
+        self.task_timeout = task_timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.retries = retries
+        self.stats = Counter()
+        self._ctx = mp.get_context()
+        self._owner_pid = os.getpid()
+        self._holds = 0
+        self._observer = None
+        self._sample_interval = None
+        self._workers = [self._spawn() for _ in range(processes)]
+
+    def _spawn(self):
+        self.stats["spawned"] += 1
+        return _Worker(self._ctx)
+
+    def _replace(self, worker, kill):
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        self._workers[self._workers.index(worker)] = self._spawn()
+
+    def owned_by_current_process(self):
+        return self._owner_pid == os.getpid()
+
+    @contextmanager
+    def hold_workers(self):
+        """Postpone recycling so worker-resident state survives the block."""
+        self._holds += 1
+        try:
+            yield self
+        finally:
+            self._holds -= 1
+            if not self._holds:
+                for worker in list(self._workers):
+                    if worker.recycle_due and worker.task is None:
+                        self._replace(worker, kill=False)
+
+    @contextmanager
+    def observe(self, observer, sample_interval=None):
+        """
+        Report every finished task as observer(func, item, seconds, stacks)
+        for the duration of the block; with `sample_interval`, workers also
+        sample their stacks (see diagnostics.StackSampler).
+        """
+        self._observer, self._sample_interval = observer, sample_interval
+        try:
+            yield self
+        finally:
+            self._observer, self._sample_interval = None, None
+
+    def map(self, func, items, fallback=None, deadline=None, return_workers=False):
+        """
+        Apply `func` to every item and return the results in order.
+
+        fallback: callable(item) giving the result for items whose task
+        failed for good (None when omitted).
+        deadline: optional absolute time.time() after which running tasks
+        are abandoned and unstarted ones are not dispatched any more.
+        return_workers: return (result, worker ident) pairs instead; the
+        ident is None for fallback results.
+        """
+        items = list(items)
+        return self._run(func, items, [None] * len(items), fallback, deadline, return_workers)
+
+    def run_on(self, assignments, func, fallback=None):
+        """
+        Run `func(item)` on the given worker for each (worker ident, item).
+
+        There is no retry elsewhere: if that worker is gone or the task
+        fails, the item gets its fallback result.
+        """
+        idents = [ident for ident, _ in assignments]
+        items = [item for _, item in assignments]
+        return self._run(func, items, idents, fallback, None, False)
+
+    def _run(self, func, items, affinity, fallback, deadline, return_workers):
+        results = [None] * len(items)
+        producers = [None] * len(items)
+        pending = deque((index, 0) for index in range(len(items)))
+        pinned = any(ident is not None for ident in affinity)
+
+        def give_up(index):
+            self.stats["failed"] += 1
+            results[index] = fallback(items[index]) if fallback else None
+
+        def retry_or_give_up(index, attempt):
+            past_deadline = deadline is not None and time.time() >= deadline
+            if attempt < self.retries and affinity[index] is None and not past_deadline:
+                self.stats["retries"] += 1
+                pending.append((index, attempt + 1))
+            else:
+                give_up(index)
+
+        while pending or any(w.task for w in self._workers):
+            if deadline is not None and time.time() >= deadline:
+                while pending:
+                    index, _ = pending.popleft()
+                    self.stats["abandoned"] += 1
+                    give_up(index)
+
+            if pinned:
+                live = {w.ident for w in self._workers}
+                for task in [t for t in pending if affinity[t[0]] not in (None, *live)]:
+                    pending.remove(task)
+                    self.stats["worker_lost"] += 1
+                    give_up(task[0])
+
+            for worker in self._workers:
+                if worker.task is not None:
+                    continue
+                task = next(
+                    (t for t in pending if affinity[t[0]] in (None, worker.ident)), None
+                )
+                if task is not None:
+                    pending.remove(task)
+                    index, _ = task
+                    worker.send(func, items[index], task, self._sample_interval)
+                    self.stats["tasks"] += 1
+
+            busy = [w for w in self._workers if w.task is not None]
+            if not busy:
+                continue
+
+            wait_for = None
+            limits = []
+            if self.task_timeout is not None:
+                limits.extend(w.started_at + self.task_timeout - time.monotonic() for w in busy)
+            if deadline is not None:
+                limits.append(deadline - time.time())
+            if limits:
+                wait_for = max(0.0, min(limits))
+
+            ready = wait([w.conn for w in busy], timeout=wait_for)
+
+            for worker in busy:
+                index, attempt = worker.task
+                if worker.conn in ready:
+                    try:
+                        (status, payload), rss_mb, seconds, stacks = worker.conn.recv()
+                    except (EOFError, OSError):
+                        self.stats["crashes"] += 1
+                        worker.task = None
+                        self._replace(worker, kill=True)
+                        retry_or_give_up(index, attempt)
+                        continue
+
+                    worker.task = None
+                    worker.tasks_done += 1
+                    if status == "ok":
+                        results[index] = payload
+                        producers[index] = worker.ident
+                        if self._observer:
+                            self._observer(func, items[index], seconds, stacks)
+                    else:
+                        self.stats["errors"] += 1
+                        retry_or_give_up(index, attempt)
+                    self._maybe_recycle(worker, rss_mb)
+                    continue
+
+                timed_out = (
+                    self.task_timeout is not None
+                    and time.monotonic() - worker.started_at >= self.task_timeout
+                )
+                past_deadline = deadline is not None and time.time() >= deadline
+                if timed_out or past_deadline:
+                    self.stats["timeouts" if timed_out else "abandoned"] += 1
+                    worker.task = None
+                    self._replace(worker, kill=True)
+                    retry_or_give_up(index, attempt)
+
+        if return_workers:
+            return list(zip(results, producers))
+        return results
+
+    def _maybe_recycle(self, worker, rss_mb):
+        if worker.recycle_due:
+            return
+        if self.max_tasks_per_worker and worker.tasks_done >= self.max_tasks_per_worker:
+            self.stats["recycled_max_tasks"] += 1
+        elif self.max_rss_mb and rss_mb > self.max_rss_mb:
+            self.stats["recycled_rss"] += 1
+        else:
+            return
+        if self._holds:
+            worker.recycle_due = True
+        else:
+            self._replace(worker, kill=False)
+
+    def close(self):
+        if not self.owned_by_current_process():
+            return
+        for worker in self._workers:
+            if worker.task is not None:
+                worker.kill()
+            else:
+                worker.stop()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
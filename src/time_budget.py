@@ -0,0 +1,64 @@
+import time
+
+
+class DocumentBudget:
+    """
+    Wall-clock latency budget shared by every stage of one document.
+
+    Stages ask the budget whether they may still run their expensive parts
+    (table detection, OCR, further pages) and record which degradations they
+    applied, so the final outline can say how it was produced.
+    """
+
+    # Fraction of the budget after which each optional stage is dropped.
+    # Table detection runs before OCR, so its cutoff comes first: slow
+    # tables must leave OCR its share rather than use it up.
+    SKIP_OCR_AFTER = 0.5
+    SKIP_TABLES_AFTER = 0.3
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        # time.time() rather than perf_counter(): the deadline is also
+        # checked inside pool workers, which live in other processes.
+        self.started = time.time()
+        self.deadline = self.started + seconds if seconds else None
+        self.degradations = []
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def remaining(self):
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - time.time()
+
+    def used_fraction(self):
+        if not self.seconds:
+            return 0.0
+        return self.elapsed() / self.seconds
+
+    def exhausted(self):
+        return self.remaining() <= 0
+
+    def allow_ocr(self):
+        return self.used_fraction() < self.SKIP_OCR_AFTER
+
+    def allow_tables(self):
+        return self.used_fraction() < self.SKIP_TABLES_AFTER
+
+    def ocr_deadline(self):
+        """Absolute time after which workers should no longer start OCR."""
+        if self.deadline is None:
+            return None
+        return self.started + self.seconds * self.SKIP_OCR_AFTER
+
+    def table_deadline(self):
+        """Absolute time after which table detection is given up."""
+        if self.deadline is None:
+            return None
+        return self.started + self.seconds * self.SKIP_TABLES_AFTER
+
+    def degrade(self, kind, detail):
+        """Record a degradation once, at the point where it first applied."""
+        if not any(d.split(":", 1)[0] == kind for d in self.degradations):
+            self.degradations.append(f"{kind}:{detail}")
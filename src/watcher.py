@@ -0,0 +1,212 @@
+import time
+import signal
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from input_sources import iter_directory, source_fingerprint, DEFAULT_INCLUDE
+from output_sinks import manifest_record
+
+# A document in flight at this many breaks of the document processes is
+# taken to be what kills them, and is not retried until it changes
+MAX_POOL_BREAKS = 2
+
+
+def _init_document_worker(page_workers):
+    # Forked children inherit the watcher's stop handler. Ctrl-C is the
+    # watcher's to handle, and SIGTERM must kill them again, or the page
+    # workers ignore the SIGTERM sent at exit and shutdown hangs.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Each document process runs its own page pool; split the CPUs between them
+    import heading_extractor
+
+    heading_extractor.WORKER_POOL_SIZE = page_workers
+
+
+def _extract_document(path, time_budget):
+    from heading_extractor import extract_headings_hybrid
+
+    return extract_headings_hybrid(path, time_budget=time_budget)
+
+
+def scan_directory(root, recursive=False, include=DEFAULT_INCLUDE, exclude=()):
+    """Map each matching PDF's name to (path, fingerprint)."""
+    found = {}
+    for source in iter_directory(root, recursive, include, exclude):
+        try:
+            found[source.name] = (source.path, source_fingerprint(source))
+        except FileNotFoundError:
+            continue  # removed between listing and stat
+    return found
+
+
+class StabilityTracker:
+    """
+    Decide when a file is done being written: its size and mtime (the
+    fingerprint) must stay the same for `settle_seconds`.
+    """
+
+    def __init__(self, settle_seconds):
+        self.settle_seconds = settle_seconds
+        self._seen = {}  # name -> (fingerprint, monotonic time first seen)
+
+    def ready(self, found, now=None):
+        now = time.monotonic() if now is None else now
+        for name in [n for n in self._seen if n not in found]:
+            del self._seen[name]
+
+        stable = []
+        for name, (path, fingerprint) in found.items():
+            previous = self._seen.get(name)
+            if previous is None or previous[0] != fingerprint:
+                self._seen[name] = (fingerprint, now)
+            elif now - previous[1] >= self.settle_seconds:
+                stable.append((name, path, fingerprint))
+        return stable
+
+
+def _start_executor(concurrency, page_workers):
+    return ProcessPoolExecutor(
+        max_workers=concurrency,
+        initializer=_init_document_worker,
+        initargs=(page_workers,),
+    )
+
+
+def watch_directory(input_dir, sink, recursive=False, include=DEFAULT_INCLUDE, exclude=(),
+                    poll_interval=1.0, settle_seconds=2.0, concurrency=2,
+                    total_page_workers=8, time_budget=None):
+    """
+    Process PDFs as they appear or change in `input_dir` until SIGINT/SIGTERM.
+
+    The directory is polled every `poll_interval` seconds; a file is queued
+    once it has been stable for `settle_seconds`. Up to `concurrency`
+    documents are extracted at a time, in separate processes that share
+    `total_page_workers` page workers. Each result is flushed as soon as it
+    is done. The sink's manifest is the only state: documents it records as
+    done with the same fingerprint are not redone after a restart.
+    """
+    stopping = []
+
+    def request_stop(signum, frame):
+        stopping.append(signum)
+
+    previous_handlers = {
+        sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)
+    }
+
+    tracker = StabilityTracker(settle_seconds)
+    failed = {}      # name -> fingerprint that failed; retried once the file changes
+    queued = []      # (name, path, fingerprint) waiting for a free slot
+    in_flight = {}   # future -> (name, path, fingerprint, start)
+    breaks = Counter()  # (name, fingerprint) -> pool breaks it was in flight at
+    page_workers = max(1, total_page_workers // concurrency)
+
+    print(f"Watching {input_dir} (every {poll_interval:g}s, {concurrency} document(s) at a time)")
+
+    executor = _start_executor(concurrency, page_workers)
+    try:
+        while not stopping:
+            busy = {name for name, _, _ in queued} | {name for name, _, _, _ in in_flight.values()}
+            for name, path, fingerprint in tracker.ready(scan_directory(input_dir, recursive, include, exclude)):
+                if (
+                    name in busy
+                    or sink.manifest.succeeded(name, fingerprint)
+                    or failed.get(name) == fingerprint
+                ):
+                    continue
+                queued.append((name, path, fingerprint))
+
+            while queued and len(in_flight) < concurrency:
+                # A document caught in a break runs alone, so that a second
+                # break can only be its own
+                isolated = [n for n, _, f, _ in in_flight.values() if breaks[n, f]]
+                if isolated or (in_flight and breaks[queued[0][0], queued[0][2]]):
+                    break
+                name, path, fingerprint = queued.pop(0)
+                try:
+                    future = executor.submit(_extract_document, path, time_budget)
+                except BrokenProcessPool:
+                    queued.insert(0, (name, path, fingerprint))
+                    executor = _recover_from_break(
+                        executor, concurrency, page_workers, sink, in_flight, queued, failed, breaks
+                    )
+                    continue
+                print(f"\n[+] Processing: {name}")
+                in_flight[future] = (name, path, fingerprint, time.perf_counter())
+
+            if not in_flight:
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            if any(_broke(future) for future in done):
+                executor = _recover_from_break(
+                    executor, concurrency, page_workers, sink, in_flight, queued, failed, breaks
+                )
+                continue
+            for future in done:
+                name, _, fingerprint, start = in_flight.pop(future)
+                _finish(sink, future, name, fingerprint, start, failed)
+    finally:
+        print("\nStopping watch: waiting for documents in progress...")
+        for future in list(in_flight):
+            name, _, fingerprint, start = in_flight.pop(future)
+            _finish(sink, future, name, fingerprint, start, failed)
+        executor.shutdown()
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+
+
+def _broke(future):
+    return future.done() and isinstance(future.exception(), BrokenProcessPool)
+
+
+def _recover_from_break(executor, concurrency, page_workers, sink, in_flight, queued, failed, breaks):
+    """
+    A document process died (e.g. a MuPDF segfault), which fails every
+    document in flight. Finish those that completed first and queue the
+    others again; they are retried one at a time. One that was in flight at
+    MAX_POOL_BREAKS breaks is most likely the culprit and is recorded as
+    failed. Returns a fresh executor in place of the broken one.
+    """
+    print("[!] A document process died; restarting the worker processes")
+    for future in list(in_flight):
+        name, path, fingerprint, start = in_flight.pop(future)
+        if future.done() and not _broke(future):
+            _finish(sink, future, name, fingerprint, start, failed)
+            continue
+        breaks[name, fingerprint] += 1
+        if breaks[name, fingerprint] < MAX_POOL_BREAKS:
+            print(f"    {name} will be retried")
+            queued.insert(0, (name, path, fingerprint))
+            continue
+        error = f"document process died {breaks[name, fingerprint]} times while processing it"
+        failed[name] = fingerprint
+        sink.record_failure(
+            manifest_record(name, fingerprint, "failed", time.perf_counter() - start, error=error)
+        )
+        print(f"[!] Failed to process {name}: {error}")
+    executor.shutdown(wait=False)
+    return _start_executor(concurrency, page_workers)
+
+
+def _finish(sink, future, name, fingerprint, start, failed):
+    try:
+        result = future.result()
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        failed[name] = fingerprint
+        sink.record_failure(manifest_record(name, fingerprint, "failed", elapsed, error=str(e)))
+        print(f"[!] Failed to process {name}: {e}")
+        return
+
+    elapsed = time.perf_counter() - start
+    sink.write(name, result, manifest_record(name, fingerprint, "ok", elapsed, result=result))
+    sink.flush()
+    failed.pop(name, None)
+    print(f"[✓] Saved to: {sink.location(name)}  ⏱ {elapsed:.2f} seconds")
+    if result.get("degradations"):
+        print(f"    degraded: {', '.join(result['degradations'])}")